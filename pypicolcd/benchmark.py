@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+"""
+Measure how fast pypicolcd draws and writes to a simulated device, so
+that versions (or computers) can be compared without a picoLCD.
+Copyright (C) 2018  Jake Gustafson
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Each case does one operation (such as drawing a rectangle, which also
+writes it to the device) at a time and times each one. The results
+for each case are the operations per second, the 50th and 99th
+percentile of the time per operation, and the bytes and transfers sent
+to the device per operation (each operation is one frame). The startup
+cases time starting Python and importing the module that lcd-cli uses
+(which should not load PIL or pyusb, see HEAVY_MODULES) or the module
+that draws.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import random
+import platform
+from datetime import datetime
+from timeit import default_timer as best_timer
+
+import pypicolcd
+from pypicolcd import PicoLCD
+from pypicolcd import font_meta
+from pypicolcd import find_resource
+from pypicolcd.simulator import SimulatedDevice
+from pypicolcd.simulator import NullDevice
+
+FORMAT_VERSION = 1  # of the JSON output
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp")
+# Modules that a client (see the "startup lcd-cli" case) should not load:
+HEAVY_MODULES = ("PIL", "usb", "numpy", "pypicolcd.picolcd")
+STARTUP_IMPORTS = (
+    ("startup python", None),
+    ("startup lcd-cli", "pypicolcd.command_line"),
+    ("startup drawing", "pypicolcd.picolcd"),
+)
+
+
+def get_python_command(code):
+    """
+    Get a command that runs Python code using this copy of pypicolcd.
+    """
+    return [sys.executable, "-c", code]
+
+
+def get_python_env():
+    env = os.environ.copy()
+    package_parent = os.path.dirname(
+        os.path.dirname(os.path.abspath(pypicolcd.__file__))
+    )
+    paths = [package_parent]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return env
+
+
+def get_heavy_modules(module_name):
+    """
+    Get which of HEAVY_MODULES a new Python process loads when it
+    imports module_name.
+    """
+    code = ("import sys, {}\n"
+            "print(' '.join(name for name in {!r} if name in"
+            " sys.modules))".format(module_name, HEAVY_MODULES))
+    out = subprocess.check_output(get_python_command(code),
+                                  env=get_python_env())
+    return out.decode().split()
+
+
+def get_percentile(sorted_values, percent):
+    """
+    Get the value at percent (0-100) of sorted values (using the
+    nearest rank).
+    """
+    if len(sorted_values) < 1:
+        return None
+    rank = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+class Benchmark:
+    """
+    Run benchmark cases (see get_cases) against a simulated device.
+    """
+
+    def __init__(self, device=None, count=200, seed=1):
+        """
+        Keyword arguments:
+        device -- a SimulatedDevice (or NullDevice, the default)
+        count -- how many times to do the operation of each case (some
+            cases do fewer, such as loading images)
+        seed -- seed the random positions for repeatable results
+        """
+        if device is None:
+            device = NullDevice()
+        self.device = device
+        self.count = count
+        self.seed = seed
+        self.p = PicoLCD(device=device)
+        if not self.p.ready():
+            raise RuntimeError("The simulated device is not ready.")
+        self.results = {}
+
+    def get_cases(self):
+        """
+        Get a list of (name, operation, count) where operation is a
+        function that takes a random.Random and does one operation.
+        """
+        p = self.p
+        w = p.get_width()
+        h = p.get_height()
+        cases = []
+
+        def set_pixel(r):
+            p.set_pixel((r.randrange(w), r.randrange(h)), r.random() < .5)
+        cases.append(("set_pixel", set_pixel, self.count))
+
+        def draw_rect(r):
+            x = r.randrange(w - 8)
+            y = r.randrange(h - 8)
+            rect = ((x, y), (x + r.randint(8, 64), y + r.randint(8, 32)))
+            p.draw_rect(rect, r.random() < .5, filled=r.random() < .5)
+        cases.append(("draw_rect", draw_rect, self.count))
+
+        for name in sorted(font_meta.keys()):
+            def draw_text_at(r, name=name):
+                pos = (r.randrange(w // 2), r.randrange(h // 2))
+                p.draw_text_at(pos, "{:02}:{:02}".format(r.randrange(24),
+                                                         r.randrange(60)),
+                               font=name, erase_behind_enable=True)
+            cases.append(("draw_text_at " + name, draw_text_at, self.count))
+
+        def push_text(r):
+            # Each line scrolls after the display is full.
+            p.push_text("{} {}\n".format(r.randrange(10000),
+                                         "line of pushed text"))
+        cases.append(("push_text", push_text, self.count))
+
+        images_path = os.path.dirname(find_resource("images/maze.png"))
+        for filename in sorted(os.listdir(images_path)):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(images_path, filename)
+
+            def draw_image(r, path=path):
+                # Clear it first so that the image is always written:
+                p.draw_rect(((0, 0), (w, h)), False, refresh_enable=False)
+                p.draw_image((0, 0), path)
+            cases.append(("draw_image " + filename, draw_image,
+                          max(self.count // 10, 1)))
+
+        def full_refresh(r):
+            p.forget_device_state()
+            p.invalidate()
+            p.refresh()
+        cases.append(("full refresh", full_refresh, max(self.count // 4, 1)))
+
+        env = get_python_env()
+        for name, module_name in STARTUP_IMPORTS:
+            code = "pass"
+            if module_name is not None:
+                code = "import " + module_name
+            command = get_python_command(code)
+
+            def start(r, command=command):
+                subprocess.check_call(command, env=env)
+            cases.append((name, start, max(self.count // 20, 3)))
+        return cases
+
+    def run(self, names=None):
+        """
+        Run the benchmark cases.
+
+        Keyword arguments:
+        names -- only run cases with these names (or that start with
+            them, such as "draw_text_at")
+
+        Returns:
+            a dict of results for each case name
+        """
+        for name, operation, count in self.get_cases():
+            if names and not any(name.startswith(n) for n in names):
+                continue
+            self.results[name] = self.run_case(operation, count)
+        return self.results
+
+    def run_case(self, operation, count):
+        p = self.p
+        device = self.device
+        r = random.Random(self.seed)
+        p.clear()
+        operation(r)  # Load fonts and glyphs before timing.
+        times = []
+        transfers = device.transfers
+        bytes_received = device.bytes_received
+        start = best_timer()
+        for i in range(count):
+            t = best_timer()
+            operation(r)
+            times.append(best_timer() - t)
+        total = best_timer() - start
+        times.sort()
+        return {
+            "count": count,
+            "seconds": total,
+            "ops_per_second": count / total if total > 0 else None,
+            "p50_ms": get_percentile(times, 50) * 1000.0,
+            "p99_ms": get_percentile(times, 99) * 1000.0,
+            "bytes_per_frame":
+                (device.bytes_received - bytes_received) / float(count),
+            "transfers_per_frame":
+                (device.transfers - transfers) / float(count),
+        }
+
+    def to_dict(self):
+        return {
+            "format_version": FORMAT_VERSION,
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": pypicolcd.numpy is not None,
+            "device": type(self.device).__name__,
+            "latency": self.device.latency,
+            "seed": self.seed,
+            "lcd_cli_heavy_modules":
+                get_heavy_modules("pypicolcd.command_line"),
+            "results": self.results,
+        }
+
+
+def compare(old, new):
+    """
+    Get lines that compare the results of two benchmarks (dicts from
+    Benchmark.to_dict).
+    """
+    lines = ["{:<36} {:>10} {:>10} {:>7} {:>8}".format(
+        "case", "old ops/s", "new ops/s", "speed", "bytes")]
+    for name, result in new["results"].items():
+        old_result = old["results"].get(name)
+        if old_result is None:
+            continue
+        speed = "-"
+        if old_result["ops_per_second"] and result["ops_per_second"]:
+            speed = "{:.2f}x".format(result["ops_per_second"]
+                                     / old_result["ops_per_second"])
+        lines.append("{:<36} {:>10.1f} {:>10.1f} {:>7} {:>8.0f}".format(
+            name, old_result["ops_per_second"] or 0,
+            result["ops_per_second"] or 0, speed,
+            result["bytes_per_frame"] - old_result["bytes_per_frame"]))
+    return lines
+
+
+def get_usage():
+    return """
+Usage:
+lcd-benchmark [options]
+
+Time drawing and writing to a simulated picoLCD 256x64 and show the
+results as JSON.
+
+Options:
+--device=<name>      null (the default, which only counts bytes) or
+                     simulated (which also decodes them)
+--latency=<seconds>  the time each transfer takes (default 0)
+--count=<number>     how many operations per case (default 200)
+--seed=<number>      the random seed (default 1)
+--case=<name>        only run cases starting with name (can be a
+                     comma-separated list, such as draw_rect,push_text)
+--output=<path>      write the JSON to a file instead of the console
+--compare=<path>     also compare the results to a previous output
+"""
+
+
+def main():
+    options = {}
+    for arg in sys.argv[1:]:
+        if not arg.startswith("--") or (len(arg) == 2):
+            print(get_usage())
+            print("Unknown argument: {}".format(arg))
+            return 1
+        parts = arg[2:].split("=", 1)
+        if len(parts) > 1:
+            options[parts[0]] = parts[1]
+        else:
+            options[parts[0]] = True
+    if "help" in options:
+        print(get_usage())
+        return 0
+    device_name = options.get("device", "null")
+    latency = float(options.get("latency", 0.0))
+    if device_name == "null":
+        device = NullDevice(latency=latency)
+    elif device_name == "simulated":
+        device = SimulatedDevice(latency=latency)
+    else:
+        print(get_usage())
+        print("Unknown device: {}".format(device_name))
+        return 1
+    names = None
+    if options.get("case"):
+        names = options["case"].split(",")
+    benchmark = Benchmark(device=device,
+                          count=int(options.get("count", 200)),
+                          seed=int(options.get("seed", 1)))
+    benchmark.run(names=names)
+    data = benchmark.to_dict()
+    out_s = json.dumps(data, indent=2, sort_keys=True)
+    if options.get("output"):
+        with open(options["output"], "w") as outs:
+            outs.write(out_s + "\n")
+        print("* wrote {}".format(options["output"]))
+    else:
+        print(out_s)
+    if options.get("compare"):
+        with open(options["compare"]) as ins:
+            old = json.load(ins)
+        for line in compare(old, data):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,8 +18,10 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+# NOTE: Only import the standard library (and modules of pypicolcd that
+# only use it) so that lcd-cli starts quickly.
 from pypicolcd import lcdclient
-from pypicolcd.lcdframebuffer import LCDFramebufferServer  # get_usage
+from pypicolcd.lcdprotocol import get_usage
 
 
 import sys
@@ -122,7 +124,7 @@ def main():
     else:
         print("")
         print("")
-        print(LCDFramebufferServer.get_usage())
+        print(get_usage())
         if len(sys.argv) < 2:
             print("")
             print("You did not supply any arguments, so the client did"
@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+"""
+Keep glyphs (rendered characters, see pypicolcd.GlyphAtlas) in files so
+that new processes can draw text without rendering it using FreeType.
+Copyright (C) 2018  Jake Gustafson
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Each file is a glyph table for one font file, size and threshold. The
+file starts with a header (see _HEADER) that includes the format
+version and the SHA-256 hash of the font file, so a table is ignored
+(and rebuilt) if the format or the font changes. The header is followed
+by a record for each character (see _GLYPH), then a record for each
+pair of characters that has kerning (see _KERNING), then the pages of
+all glyphs. All numbers are little-endian. The file is memory-mapped,
+so the pages are not copied until they are drawn.
+"""
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+import tempfile
+
+FORMAT_VERSION = 1
+MAGIC = b"PLCDGLYF"
+
+# Each table has a glyph for every character in CHARSET and the kerning
+# of every pair of those characters.
+CHARSET = "".join(chr(i) for i in range(32, 127))
+
+# magic, version, (reserved), font sha256, font size, threshold,
+# glyph count, kerning count:
+_HEADER = struct.Struct("<8sHH32sddII")
+# codepoint, x, y, width, height, advance, ink start, ink stop,
+# flags (see _HAS_INK), pages offset (from the start of the file),
+# pages length:
+_GLYPH = struct.Struct("<IhhHHdhhB3xII")
+# first codepoint, second codepoint, kerning:
+_KERNING = struct.Struct("<IId")
+_HAS_INK = 1
+
+_font_hashes = {}  # (path, mtime, size) of each font file: hash
+
+
+def get_cache_dir():
+    """
+    Get the directory where glyph tables are stored by default
+    (pypicolcd/glyphs in XDG_CACHE_HOME, or in ~/.cache).
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "pypicolcd", "glyphs")
+
+
+def get_font_hash(font_path):
+    """
+    Get the SHA-256 digest (bytes) of a font file (only read again if
+    the modified time or size of the file changes).
+    """
+    st = os.stat(font_path)
+    key = (font_path, st.st_mtime, st.st_size)
+    digest = _font_hashes.get(key)
+    if digest is None:
+        with open(font_path, "rb") as ins:
+            digest = hashlib.sha256(ins.read()).digest()
+        _font_hashes[key] = digest
+    return digest
+
+
+def font_has_kerning(font_path):
+    """
+    Check whether a TrueType or OpenType font file has a "kern" table
+    (otherwise FreeType doesn't kern any pair of characters unless text
+    shaping is used). If the file can't be read, assume that it does.
+    """
+    try:
+        with open(font_path, "rb") as ins:
+            header = ins.read(12)
+            count = struct.unpack(">H", header[4:6])[0]
+            records = ins.read(16 * count)
+    except (OSError, struct.error):
+        return True
+    if len(records) < 16 * count:
+        return True
+    for i in range(count):
+        if records[i*16:i*16+4] == b"kern":
+            return True
+    return False
+
+
+def write_table(path, font_hash, font_size, threshold, glyphs, kerning):
+    """
+    Write a glyph table (replacing the file only when it is complete,
+    so that processes reading the old one are not affected).
+
+    Sequential arguments:
+    font_hash -- the value of get_font_hash for the font file
+    glyphs -- a dict where each key is a character and each value is a
+        glyph dict (see pypicolcd.GlyphAtlas)
+    kerning -- a dict where each key is a 2-character string and each
+        value is its kerning (pairs that are not present have none)
+    """
+    offset = (_HEADER.size + _GLYPH.size * len(glyphs)
+              + _KERNING.size * len(kerning))
+    records = bytearray()
+    pages = bytearray()
+    for c, glyph in glyphs.items():
+        flags = 0
+        ink = glyph["ink"]
+        if ink is not None:
+            flags |= _HAS_INK
+        else:
+            ink = (0, 0)
+        records += _GLYPH.pack(ord(c), glyph["x"], glyph["y"],
+                               glyph["width"], glyph["height"],
+                               glyph["advance"], ink[0], ink[1], flags,
+                               offset + len(pages), len(glyph["pages"]))
+        pages += glyph["pages"]
+    for pair, value in kerning.items():
+        records += _KERNING.pack(ord(pair[0]), ord(pair[1]), value)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, font_hash,
+                          float(font_size), float(threshold),
+                          len(glyphs), len(kerning))
+    parent = os.path.dirname(path)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    fd, tmp_path = tempfile.mkstemp(dir=parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as outs:
+            outs.write(header)
+            outs.write(records)
+            outs.write(pages)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class GlyphTable:
+    """
+    A memory-mapped glyph table file (see write_table).
+    """
+
+    def __init__(self, path, font_hash=None):
+        """
+        Open a glyph table.
+
+        Keyword arguments:
+        font_hash -- if not None, raise ValueError if the table was not
+            made from a font file with this hash
+
+        Raises ValueError if the file is not a glyph table of this
+        FORMAT_VERSION.
+        """
+        self.path = path
+        with open(path, "rb") as ins:
+            self._map = mmap.mmap(ins.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._load(font_hash)
+        except Exception:
+            self._map.close()
+            raise
+
+    def _load(self, font_hash):
+        view = self._map
+        if len(view) < _HEADER.size:
+            raise ValueError("The glyph table is truncated.")
+        (magic, version, _, table_hash, self.font_size, self.threshold,
+         glyph_count, kerning_count) = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("The file is not a glyph table.")
+        if version != FORMAT_VERSION:
+            raise ValueError("The glyph table version is {} not {}."
+                             "".format(version, FORMAT_VERSION))
+        if (font_hash is not None) and (table_hash != font_hash):
+            raise ValueError("The glyph table is for a different font.")
+        self.font_hash = table_hash
+        end = (_HEADER.size + _GLYPH.size * glyph_count
+               + _KERNING.size * kerning_count)
+        if len(view) < end:
+            raise ValueError("The glyph table is truncated.")
+        self._records = {}
+        offset = _HEADER.size
+        for _ in range(glyph_count):
+            record = _GLYPH.unpack_from(view, offset)
+            if record[9] + record[10] > len(view):
+                raise ValueError("The glyph table is truncated.")
+            self._records[chr(record[0])] = record
+            offset += _GLYPH.size
+        self.kerning = {}
+        for _ in range(kerning_count):
+            first, second, value = _KERNING.unpack_from(view, offset)
+            self.kerning[chr(first) + chr(second)] = value
+            offset += _KERNING.size
+        self._view = memoryview(self._map)
+
+    def get(self, c):
+        """
+        Get the glyph dict (see pypicolcd.GlyphAtlas) for character c,
+        or None if the table doesn't have it. The pages are a
+        memoryview of the file.
+        """
+        record = self._records.get(c)
+        if record is None:
+            return None
+        (_, x, y, width, height, advance, ink_start, ink_stop, flags,
+         offset, length) = record
+        ink = None
+        if flags & _HAS_INK:
+            ink = (ink_start, ink_stop)
+        return {
+            "pages": self._view[offset:offset+length],
+            "x": x,
+            "y": y,
+            "width": width,
+            "height": height,
+            "advance": advance,
+            "ink": ink,
+        }
+
+    def get_kerning(self, pair):
+        """
+        Get the kerning of a pair of characters, or None if the table
+        doesn't have both characters.
+        """
+        if (pair[0] not in self._records) or (pair[1] not in self._records):
+            return None
+        return self.kerning.get(pair, 0.0)
+
+    def __contains__(self, c):
+        return c in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+
+class GlyphCache:
+    """
+    Find, build and open glyph tables in a directory (see
+    get_cache_dir).
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = get_cache_dir()
+        self.path = path
+        self._tables = {}  # (font_path, size, threshold): table or None
+        self.enable_save = True  # False after saving fails
+
+    def get_table_path(self, font_hash, font_size, threshold):
+        return os.path.join(
+            self.path,
+            "{}-{}-{}.glyphs".format(font_hash.hex()[:16], font_size,
+                                     threshold)
+        )
+
+    def get_table(self, font_path, font_size, threshold, build=None):
+        """
+        Get the GlyphTable for a font, or None if there is none (and
+        build is None or fails).
+
+        Keyword arguments:
+        build -- a function that takes no arguments and returns a tuple
+            of glyphs and kerning (see write_table) for the characters
+            in CHARSET, which is called if the table doesn't exist or
+            is out of date
+        """
+        key = (font_path, font_size, threshold)
+        if key in self._tables:
+            return self._tables[key]
+        table = None
+        try:
+            font_hash = get_font_hash(font_path)
+        except OSError:
+            self._tables[key] = None
+            return None
+        path = self.get_table_path(font_hash, font_size, threshold)
+        if os.path.isfile(path):
+            try:
+                table = GlyphTable(path, font_hash=font_hash)
+            except (ValueError, OSError):
+                table = None
+        if (table is None) and (build is not None) and self.enable_save:
+            glyphs, kerning = build()
+            try:
+                write_table(path, font_hash, font_size, threshold,
+                            glyphs, kerning)
+                table = GlyphTable(path, font_hash=font_hash)
+            except OSError as ex:
+                # Such as if the cache directory isn't writable.
+                print("[ pypicolcd ] WARNING: The glyph cache couldn't"
+                      " be saved: {}".format(ex))
+                self.enable_save = False
+        self._tables[key] = table
+        return table
+
+    def clear(self):
+        """
+        Delete all glyph tables in the directory.
+
+        Returns:
+            the number of files deleted
+        """
+        self._tables = {}
+        count = 0
+        if not os.path.isdir(self.path):
+            return 0
+        for name in os.listdir(self.path):
+            if name.endswith(".glyphs"):
+                os.remove(os.path.join(self.path, name))
+                count += 1
+        return count
+
+
+def get_usage():
+    return """
+Usage:
+lcd-glyph-cache [options]
+
+Build the glyph cache for the fonts that come with pypicolcd at their
+default sizes and thresholds (or only for the options specified), so
+that text can be drawn without rendering it.
+
+Options:
+--font=<name>       a bundled font name (such as ninepin) or font file
+--size=<points>     the font size
+--threshold=<0-1>   the opacity at which a pixel is on
+--clear             delete the cache instead (then exit)
+--cache-dir=<path>  the directory instead of {}
+""".format(get_cache_dir())
+
+
+def main():
+    import pypicolcd
+    options = {}
+    for arg in sys.argv[1:]:
+        if not arg.startswith("--") or (len(arg) == 2):
+            print(get_usage())
+            print("Unknown argument: {}".format(arg))
+            return 1
+        parts = arg[2:].split("=", 1)
+        if len(parts) > 1:
+            options[parts[0]] = parts[1]
+        else:
+            options[parts[0]] = True
+    if "help" in options:
+        print(get_usage())
+        return 0
+    cache = GlyphCache(path=options.get("cache-dir"))
+    if options.get("clear"):
+        print("* deleted {} glyph table(s) from {}"
+              "".format(cache.clear(), cache.path))
+        return 0
+    jobs = []  # (font_path, font_size, threshold)
+    font = options.get("font")
+    if font is not None:
+        meta = pypicolcd.get_font_meta(font)
+        if meta is not None:
+            font_path = meta["path"]
+            font_size = meta["default_size"]
+        else:
+            font_path = os.path.abspath(font)
+            font_size = 8
+        if options.get("size") is not None:
+            font_size = int(options["size"])
+        threshold = options.get("threshold")
+        if threshold is not None:
+            threshold = float(threshold)
+        else:
+            threshold = pypicolcd.get_default_threshold(font_path,
+                                                        font_size)
+        jobs.append((font_path, font_size, threshold))
+    else:
+        for name, meta in sorted(pypicolcd.font_meta.items()):
+            font_size = meta["default_size"]
+            if options.get("size") is not None:
+                font_size = int(options["size"])
+            thresholds = [pypicolcd.get_default_threshold(meta["path"],
+                                                          font_size)]
+            if name == "ninepin":
+                # See push_text.
+                thresholds.append(.5)
+            for threshold in thresholds:
+                jobs.append((meta["path"], font_size, threshold))
+    atlas = pypicolcd.GlyphAtlas(disk_cache=cache)
+    for font_path, font_size, threshold in jobs:
+        table = cache.get_table(
+            font_path, font_size, threshold,
+            build=lambda: atlas.build_table(font_path, font_size,
+                                            threshold)
+        )
+        if table is None:
+            print("* ERROR: could not cache {} size {} threshold {}"
+                  "".format(font_path, font_size, threshold))
+            return 1
+        print("* {} glyphs: {}".format(len(table), table.path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
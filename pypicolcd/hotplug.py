@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Wait for a USB device to be plugged in without scanning the USB buses
+(this module only uses the standard library).
+Copyright (C) 2018  Jake Gustafson
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+On Linux, HotplugMonitor listens for the kernel's uevents (the same
+notifications that udev gets) using a netlink socket. Otherwise (or if
+the socket can't be opened), it checks /sys/bus/usb/devices, which is
+much faster than scanning the buses using libusb, and if that is also
+unavailable, it only waits (so the caller polls).
+"""
+
+import os
+import time
+import socket
+import select
+
+NETLINK_KOBJECT_UEVENT = 15
+_KERNEL_GROUP = 1  # uevents from the kernel (not rebroadcast by udev)
+SYS_USB_DEVICES = "/sys/bus/usb/devices"
+
+
+class HotplugMonitor:
+
+    def __init__(self, products, poll_interval=.5):
+        """
+        Sequential arguments:
+        products -- a list of (idVendor, idProduct) tuples to watch for
+
+        Keyword arguments:
+        poll_interval -- how often to check /sys if there are no
+            uevents
+        """
+        self.products = set(products)
+        self.poll_interval = poll_interval
+        self._sock = None
+        try:
+            self._sock = socket.socket(socket.AF_NETLINK,
+                                       socket.SOCK_DGRAM,
+                                       NETLINK_KOBJECT_UEVENT)
+            self._sock.bind((0, _KERNEL_GROUP))
+        except (AttributeError, OSError):
+            # AttributeError: AF_NETLINK is only available on Linux.
+            if self._sock is not None:
+                self._sock.close()
+            self._sock = None
+
+    def get_method(self):
+        """
+        Get how the monitor detects devices: "netlink", "sys" or "poll"
+        (see the module docstring).
+        """
+        if self._sock is not None:
+            return "netlink"
+        if os.path.isdir(SYS_USB_DEVICES):
+            return "sys"
+        return "poll"
+
+    def is_present(self):
+        """
+        Check whether a watched device is in /sys.
+
+        Returns:
+            True or False, or None if /sys is not available
+        """
+        try:
+            names = os.listdir(SYS_USB_DEVICES)
+        except OSError:
+            return None
+        for name in names:
+            path = os.path.join(SYS_USB_DEVICES, name)
+            try:
+                with open(os.path.join(path, "idVendor")) as ins:
+                    vendor = int(ins.read().strip(), 16)
+                with open(os.path.join(path, "idProduct")) as ins:
+                    product = int(ins.read().strip(), 16)
+            except (OSError, ValueError):
+                # It is an interface (or it was removed).
+                continue
+            if (vendor, product) in self.products:
+                return True
+        return False
+
+    def wait(self, timeout):
+        """
+        Wait until a watched device is plugged in (or may have been).
+
+        Returns:
+            True if the caller should try to connect now, or False if
+            timeout seconds passed and no watched device was added
+        """
+        if self._sock is None:
+            return self._wait_sys(timeout)
+        end = time.time() + timeout
+        while True:
+            remaining = end - time.time()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self._sock], [], [],
+                                           remaining)
+            if not readable:
+                return False
+            try:
+                data = self._sock.recv(8192)
+            except OSError:
+                return True
+            if self._is_added(data):
+                return True
+
+    def _wait_sys(self, timeout):
+        end = time.time() + timeout
+        while True:
+            present = self.is_present()
+            if present is None:
+                # Only polling is possible.
+                time.sleep(max(end - time.time(), 0))
+                return True
+            if present:
+                return True
+            remaining = end - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+
+    def _is_added(self, data):
+        """
+        Check whether a uevent message says that a watched device was
+        added (the message is "ACTION@DEVPATH" then "KEY=VALUE" lines,
+        each ending with a null character).
+        """
+        fields = {}
+        for line in data.split(b"\0")[1:]:
+            key, sep, value = line.partition(b"=")
+            if sep:
+                fields[key] = value
+        if fields.get(b"ACTION") != b"add":
+            return False
+        if fields.get(b"SUBSYSTEM") != b"usb":
+            return False
+        # PRODUCT is idVendor/idProduct/bcdDevice in hexadecimal:
+        parts = fields.get(b"PRODUCT", b"").split(b"/")
+        if len(parts) < 2:
+            return False
+        try:
+            product = (int(parts[0], 16), int(parts[1], 16))
+        except ValueError:
+            return False
+        return product in self.products
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -5,16 +5,18 @@
 # from pypicolcd import get_font_meta
 # from datetime import datetime
 # import random
-import pypicolcd
+# NOTE: Only import the standard library (and lcdprotocol, which only
+# uses the standard library) so that lcd-cli starts quickly.
 # from pypicolcd.lcddaemon import LCDFramebufferServer
-from pypicolcd.lcdframebuffer import LCD_PORT
+from pypicolcd.lcdprotocol import LCD_PORT
+from pypicolcd.lcdprotocol import JSON_MAX
 # import timeit
 # from timeit import default_timer as best_timer
-import sys
 import json
+import atexit
 import socket
-import asyncore
-import copy
+import threading
+import itertools
 try:
     from urllib.parse import urlparse
     from urllib.parse import quote
@@ -25,144 +27,387 @@ except ImportError:
     from urllib import unquote
 # TODO: gradually add features from example-cli.py
 
+DEFAULT_TIMEOUT = 30.0  # seconds to wait for lcd-fb (flash is slow)
 
-class LCDFramebufferClient(asyncore.dispatcher):
 
-    def __init__(self, host, path, action, port=None, results=None):
-        """
-        Initialize a temporary one-action client (that closes after
-        sending an object to a pypicolcd lcd-fb server and showing
-        the response).
+class LCDFramebufferClient:
 
-        Sequential arguments:
-        host -- Connect to this hostname or IP address.
-        path -- Connect to this path on the server (normally /)
-        action -- Send this object as JSON to the server.
+    def __init__(self, host="localhost", port=None,
+                 timeout=DEFAULT_TIMEOUT):
+        """
+        Initialize a client that keeps one keep-alive (HTTP/1.1)
+        connection to a pypicolcd lcd-fb server and reuses it for each
+        request. The connection is opened by the first request, and if
+        the server closes it (such as if lcd-fb restarted), the next
+        request opens a new one.
 
         Keyword arguments:
+        host -- Connect to this hostname or IP address.
         port -- Use this port on the remote machine (if None, default
-            to pypicolcd.lcdframebuffer.LCD_PORT)
-        results -- The object will use this dictionary for output:
-            either response variables that the server sends as JSON, or
-            an "error" key generated locally. The server may also
-            generate an "error" key. Only if the response is good, the
-            results will contain a "status" key with the string "OK".
-            This parameter sets the self.results member.
+            to pypicolcd.lcdprotocol.LCD_PORT)
+        timeout -- Give up if the server doesn't respond for this many
+            seconds.
         """
-        self.results = results
         if port is None:
             port = LCD_PORT
-        asyncore.dispatcher.__init__(self)
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
         self.host = host
         self.port = port
-        self.connect((host, port))
-        buffer_s = 'GET {} HTTP/1.0\r\n\r\n'.format(path)
-        self.buffer = buffer_s.encode()
-        # self.buffer2 = json.dumps(action).encode()
-        # try:
-        # except ConnectionRefusedError:
-        #     print("* the lcd-fb server is not running.")
-        #     self.close()
-        #     return
-
-    def handle_connect(self):
-        pass
-
-    def handle_error(self):
-        # See
-        # https://github.com/python/cpython/blob/master/Lib/asyncore.py
-        # nil, t, v, tbinfo = compact_traceback()
-        # See <https://github.com/python/cpython/blob/
-        # 5bbac8cbdf140ebce446ea4e7db2b20a5d7b8402/Lib/asyncore.py#L533>
-        t, v, tb = sys.exc_info()
-
-        msg = (
-            "lcd-fb at {}:{} responded with {}:{}.".format(
-                self.host,
-                self.port,
-                t,
-                v
-            )
-        )
-        if self.results is not None:
-            self.results["error"] = msg
-        else:
-            print("ERROR: " + msg)
-        self.close()  # ONLY close on read in one-shot command scripts.
-
-    def handle_close(self):
+        self.timeout = timeout
+        self.connects = 0  # how many connections were opened
+        self.requests = 0  # how many requests were answered
+        self._sock = None
+        self._buffer = b""  # received bytes not yet parsed
+        self._received = 0  # bytes received on this connection
+        self._lock = threading.Lock()
+
+    def connect(self):
         self.close()
-        # print("* the connection has closed.")
+        self._sock = socket.create_connection((self.host, self.port),
+                                              timeout=self.timeout)
+        self._received = 0
+        # Send each request right away instead of waiting to combine
+        # it with the next one (Nagle's algorithm):
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connects += 1
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+        self._buffer = b""
+
+    def is_connected(self):
+        return self._sock is not None
+
+    def send_action(self, action):
+        """
+        Send a dictionary to the server as JSON (the body of a POST
+        request).
+
+        Returns:
+            the results: either response variables that the server sends
+            as JSON, or an "error" key generated locally. The server may
+            also generate an "error" key. Only if the response is good,
+            the results will contain a "status" key with the string
+            "OK".
+        """
+        return self.send_actions([action])[0]
+
+    def send_actions(self, actions):
+        """
+        Send several actions (see send_action) without waiting for each
+        response before sending the next request (pipelining). The
+        server still runs them in order.
+
+        Returns:
+            a list of results, one for each action
+        """
+        requests = []
+        for action in actions:
+            requests.append(("POST", "/", json.dumps(action).encode(),
+                             "application/json"))
+        return self.exchange(requests)
+
+    def send_batch(self, actions):
+        """
+        Send a list of actions that the server runs as one transaction
+        (see LCDFramebufferServer.push_batch): the LCD is only written
+        after the last one, and if one fails, the batch is undone.
+
+        Returns:
+            the results (see send_action), where "results" is the list
+            of results of each action (unless the request failed)
+        """
+        return self.exchange([(
+            "POST", "/batch", json.dumps(actions).encode(),
+            "application/json"
+        )])[0]
 
-    def handle_read(self):
-        # print(self.recv(pypicolcd.JSON_MAX).decode())
+    def blit(self, pos, data, size, op="copy", layout="rows"):
+        """
+        Draw a 1-bit bitmap (bytes) using the /blit endpoint of the
+        server (see PicoLCD.blit for the op and layout).
+
+        Returns:
+            the results (see send_action)
+        """
+        path = ("/blit?x={}&y={}&width={}&height={}&op={}&layout={}"
+                "".format(pos[0], pos[1], size[0], size[1], quote(op),
+                          quote(layout)))
+        return self.exchange([(
+            "POST", path, bytes(data), "application/octet-stream"
+        )])[0]
+
+    def exchange(self, requests):
+        """
+        Send requests and read the responses (in the same order).
+
+        If the connection was already open but the server closed it
+        before sending anything (such as because it was idle), the
+        requests are sent again using a new connection (only once,
+        since if a new connection also fails, the server is not running
+        or is failing). They are never sent again after a timeout,
+        since the server may have received them and still be running
+        them (such as flash).
+
+        Sequential arguments:
+        requests -- a list of (method, path, body, content_type)
+            tuples, where body is bytes
+
+        Returns:
+            a list of results (see send_action), one for each request
+        """
+        results = []
+        pending = list(requests)
+        retry_enable = True
+        with self._lock:
+            while pending:
+                reused = self._sock is not None
+                answered = 0  # on this connection
+                sent_at = 0  # self._received when the requests were sent
+                try:
+                    if not reused:
+                        self.connect()
+                    sent_at = self._received
+                    self._sock.sendall(b"".join(
+                        self._format_request(*request)
+                        for request in pending
+                    ))
+                    while pending:
+                        status, headers, body = self._read_response()
+                        pending.pop(0)
+                        answered += 1
+                        self.requests += 1
+                        results.append(self._parse_body(body))
+                        connection = headers.get("connection", "")
+                        if connection.lower() == "close":
+                            # Send the rest using a new connection.
+                            self.close()
+                            break
+                except OSError as e:
+                    # (socket.timeout and ConnectionError are OSError.)
+                    received = self._received - sent_at
+                    self.close()
+                    closed = isinstance(e, (ConnectionResetError,
+                                            BrokenPipeError))
+                    if (reused and retry_enable and closed
+                            and (answered == 0) and (received == 0)):
+                        # The server closed the idle connection.
+                        retry_enable = False
+                        continue
+                    msg = ("lcd-fb at {}:{} responded with {}:{}."
+                           "".format(self.host, self.port, type(e), e))
+                    for request in pending:
+                        results.append({"error": msg})
+                    break
+        return results
+
+    def _format_request(self, method, path, body, content_type):
+        head = ("{} {} HTTP/1.1\r\n"
+                "Host: {}:{}\r\n"
+                "Content-Type: {}\r\n"
+                "Content-Length: {}\r\n"
+                "\r\n".format(method, path, self.host, self.port,
+                              content_type, len(body)))
+        return head.encode() + body
 
-        res_bytes = self.recv(pypicolcd.JSON_MAX)
-        if res_bytes:
-            res_s = res_bytes.decode()
+    def _recv_more(self):
+        data = self._sock.recv(max(JSON_MAX, 65536))
+        if not data:
+            raise ConnectionResetError("The server closed the"
+                                       " connection.")
+        self._received += len(data)
+        self._buffer += data
+
+    def _read_response(self):
+        """
+        Read the next response from the connection.
+
+        Returns:
+            a (status, headers, body) tuple, where the header names are
+            lowercase
+        """
+        while True:
+            end = self._buffer.find(b"\r\n\r\n")
+            if end >= 0:
+                break
+            if len(self._buffer) > JSON_MAX:
+                raise ConnectionAbortedError("The response headers are"
+                                             " too long.")
+            self._recv_more()
+        lines = self._buffer[:end].decode("latin-1").split("\r\n")
+        self._buffer = self._buffer[end+4:]
+        words = lines[0].split(" ", 2)
+        if (len(words) < 2) or (not words[0].startswith("HTTP/")):
+            raise ConnectionAbortedError("The server sent an invalid"
+                                         " status line: '{}'"
+                                         "".format(lines[0]))
+        try:
+            status = int(words[1])
+        except ValueError:
+            raise ConnectionAbortedError("The server sent an invalid"
+                                         " status: '{}'".format(lines[0]))
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length_s = headers.get("content-length")
+        if length_s is None:
+            # The body ends when the server closes the connection.
             try:
-                res = json.loads(res_s)
-                if self.results is not None:
-                    for k, v in res.items():
-                        self.results[k] = v
-                else:
-                    print("* the server says: {}".format(res))
-                # code = 0
-                # if res.get("error") is not None:
-                    # code = 1
-            except json.decoder.JSONDecodeError:
-                print("* ERROR: the server provided invalid JSON:"
-                      " '{}'".format(res_s))
-        else:
-            print("* ERROR: The server provided an empty response.")
-        self.close()  # ONLY close on read in one-shot command scripts.
-
-    def writable(self):
-        return (len(self.buffer) > 0)
-
-    def handle_write(self):
-        sent = self.send(self.buffer)
-        # print("* sent '{}'".format(self.buffer[:sent].decode()))
-        self.buffer = self.buffer[sent:]
+                while True:
+                    self._recv_more()
+            except ConnectionResetError:
+                pass
+            body = self._buffer
+            self._buffer = b""
+            headers["connection"] = "close"
+            return status, headers, body
+        length = int(length_s)
+        while len(self._buffer) < length:
+            self._recv_more()
+        body = self._buffer[:length]
+        self._buffer = self._buffer[length:]
+        return status, headers, body
 
+    def _parse_body(self, body):
+        if not body:
+            return {"error": "The server provided an empty response."}
+        res_s = body.decode(errors="replace")
+        try:
+            res = json.loads(res_s)
+        except ValueError:
+            return {"error": "The server provided invalid JSON:"
+                             " '{}'".format(res_s)}
+        if not isinstance(res, dict):
+            return {"error": "The server provided JSON that is not an"
+                             " object: '{}'".format(res_s)}
+        return res
 
-def send_action(action):
+
+_clients = {}  # LCDFramebufferClient instances by (host, port)
+_clients_lock = threading.Lock()
+
+
+def get_client(host=None, port=None):
     """
-    Send a dictionary to the server as JSON using a single-use
-    LCDFramebufferClient instance.
+    Get the shared client for a server (so each process keeps one
+    connection to each lcd-fb server it uses).
 
-    Sequential arguments:
-    action -- a dictionary containing settings such as:
-        - lines: a list of custom text lines
-        - host: the hostname or IP address of the server
-        - port: the port of the server
-        - help: set this to True to see a list of commands.
+    Keyword arguments:
+    host -- the hostname or IP address of the server (if None,
+        default to localhost)
+    port -- the port of the server (if None, default to
+        pypicolcd.lcdprotocol.LCD_PORT)
     """
-    action = copy.deepcopy(action)
-    # action = json.loads(json.dumps(action))
-    # deepcopy is not thread safe and json is, according to
-    # <https://stackoverflow.com/questions/5105517/
-    # deep-copy-of-a-dict-in-python#comment71372193_5105554>
-    host = action.get("host")
     if host is None:
         host = "localhost"
-    if "host" in action:
-        del action["host"]
-    print("* sending '{}'...".format(action))
-    action_json = json.dumps(action)
-    url_args = ""
-    url_args = "?json=" + quote(action_json, safe='')
-    # print("* sending '{}'...".format(url_args))
+    if port is None:
+        port = LCD_PORT
+    with _clients_lock:
+        client = _clients.get((host, port))
+        if client is None:
+            client = LCDFramebufferClient(host, port=port)
+            _clients[(host, port)] = client
+        return client
+
+
+def close_clients():
+    """
+    Close the connections of the shared clients (see get_client).
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+
+
+atexit.register(close_clients)
+
+
+def _split_address(action):
+    """
+    Get a (host, port, action) tuple where action is a copy of the
+    action without the host and port (which are only for the client).
+    """
+    host = action.get("host")
     port = action.get("port")
-    if "port" in action:
-        del action["port"]
-    results = {}
-    client = LCDFramebufferClient(host, '/'+url_args, action, port=port,
-                                  results=results)
-    asyncore.loop()
+    action = {k: v for k, v in action.items()
+              if k not in ("host", "port")}
+    return host, port, action
+
+
+def _add_hint(results):
     error = results.get("error")
     if error is not None:
         if "ConnectionRefusedError" in error:
             results['error'] += " Try specifying host as a LAN address."
     return results
+
+
+def send_action(action):
+    """
+    Send a dictionary to the server as JSON using the shared
+    LCDFramebufferClient for the server (see get_client).
+
+    Sequential arguments:
+    action -- a dictionary containing settings such as:
+        - lines: a list of custom text lines
+        - host: the hostname or IP address of the server
+        - port: the port of the server
+        - help: set this to True to see a list of commands.
+    """
+    return send_actions([action])[0]
+
+
+def send_actions(actions):
+    """
+    Send several actions (see send_action) in order. Consecutive actions
+    for the same server are pipelined using its shared client.
+
+    Returns:
+        a list of results, one for each action
+    """
+    results = []
+    addressed = [_split_address(action) for action in actions]
+    for (host, port), group in itertools.groupby(
+            addressed, key=lambda split: split[:2]):
+        group_actions = []
+        for _, _, action in group:
+            print("* sending '{}'...".format(action))
+            group_actions.append(action)
+        client = get_client(host, port)
+        for res in client.send_actions(group_actions):
+            results.append(_add_hint(res))
+    return results
+
+
+def send_batch(actions):
+    """
+    Send several actions as one transaction (see
+    LCDFramebufferClient.send_batch) using the shared client for the
+    server (the host and port of the first action).
+
+    Returns:
+        a list of results, one for each action (each is the error if
+        the whole request failed)
+    """
+    if len(actions) < 1:
+        return []
+    addressed = [_split_address(action) for action in actions]
+    host, port, _ = addressed[0]
+    batch = []
+    for split in addressed:
+        if split[:2] != (host, port):
+            raise ValueError("The actions of a batch must be for the"
+                             " same server.")
+        batch.append(split[2])
+    print("* sending a batch of {}...".format(batch))
+    res = _add_hint(get_client(host, port).send_batch(batch))
+    results = res.get("results")
+    if not isinstance(results, list) or (len(results) != len(batch)):
+        # The request failed (or the server is older).
+        return [dict(res) for action in batch]
+    return results
@@ -20,18 +20,33 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import pypicolcd
 from pypicolcd import PicoLCD
+from pypicolcd import OffscreenBuffer
 # from pypicolcd import find_resource
 from pypicolcd import get_font_meta
-from pypicolcd import to_bool
+from pypicolcd import DC_DICT
+from pypicolcd import VENDOR_ID
+from pypicolcd.hotplug import HotplugMonitor
+from pypicolcd.lcdprotocol import (
+    LCD_PORT,
+    JSON_MAX,
+    BODY_MAX,
+    bool_options,
+    allowed_commands,
+    font_meta,
+    get_usage,
+    to_bool,
+)
 
+import os
 import sys
 import signal
 import logging
 import json
-import asyncore
-import socket
+import asyncio
 import time
-from threading import Timer, Thread, Event
+from threading import Timer, Thread, Event, Lock, RLock
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 try:
     from urllib.parse import unquote
     from urllib.parse import quote
@@ -45,10 +60,25 @@ except ImportError:
     # NOTE: ModuleNotFoundError is only available in Python 3.
     pass
 
-LCD_PORT = 25664
 TIME_FMT = "%Y-%m-%d %H:%M"  # :%S
-bool_options = ["verbose", "clock"]
-allowed_commands = ["clear", "flash", "push", "help", "refresh"]
+# An action with only these options draws lines of text without other
+# effects, so a newer one over the same region replaces it (see
+# LCDFramebufferServer.get_update_key):
+UPDATE_NAMES = ("lines", "x", "y", "font", "layer")
+CLOCK_LAYER = "clock"
+CLOCK_Z = 1000  # the clock is in front of other layers
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+    503: "Service Unavailable",
+}
 
 
 def customDie(msg, exit_code=1, logger=None):
@@ -61,136 +91,428 @@ def customDie(msg, exit_code=1, logger=None):
     exit(exit_code)
 
 
-class LCDRequestHandler(asyncore.dispatcher_with_send):
-    def __init__(self, sock, service):
-        asyncore.dispatcher_with_send.__init__(self, sock)
-        self.service = service
+class HTTPError(Exception):
+    """
+    A request that gets an error response (see STATUS_REASONS) instead
+    of running an action.
+    """
 
-    # See https://docs.python.org/2/library/asyncore.html
-    def handle_read(self):
-        req_bytes = self.recv(pypicolcd.JSON_MAX)
-        if req_bytes is not None:
-            req_s = req_bytes.decode()
-            if len(req_s) > 0:
-                if req_s.startswith("GET /"):
-                    self.reroute_get(req_s)
-                else:
-                    print("* the request type is not implemented:"
-                          " '{}'".format(req_s))
-            else:
-                pass
-                # TODO: I'm not sure why this happens, but it happens
-                #   whenever the connection closes.
-                # print("* the client provided a blank get request.")
-        else:
-            print("* the client provided a NULL get request.")
-
-    def reroute_get(self, req_s):
-        if req_s.startswith("GET /"):
-            words = req_s.split(" ")
-            # print("* got request parts: {}".format(words))
-            url_path = words[1]
-            # print("* url_path:'{}'".format(url_path))
-            mark_i = url_path.find("?")
-            params_s = ""
-            if mark_i >= 0:
-                params_s = url_path[mark_i+1:]
-                url_path = url_path[:mark_i]
-            # else:
-            #     print("* there are no params in the path.")
-            # if len(params_s) < 1:
-            #     print("* WARNING: url_path's ? is at"
-            #           " {}".format(mark_i))
-            #     print("* WARNING: and {} is at 2".format(url_path[2]))
-            # print("* as '{}'".format(params_s))
-            chunks = params_s.split("&")
-            params = {}
-            for chunk in chunks:
-                parts = chunk.split("=")
-                name = None
-                value = None
-                # print("  * contains '{}'".format(chunk))
-                if len(parts) >= 1:
-                    name = parts[0]
-                if len(parts) >= 2:
-                    value = unquote(parts[1])
-                if len(parts) > 2:
-                    print("  * ERROR: malformed URL param:"
-                          " '{}'".format(chunk))
-                # print("    * as {}:'{}'".format(name, value))
-                if name == 'json':
-                    try:
-                        req = json.loads(value)
-                        res = self.service.push_action(req)
-                        # print("* The server got a JSON object:"
-                        #       " {}".format(req))
-                        res_bytes = json.dumps(res).encode()
-                        self.send(res_bytes)
-                    except json.decoder.JSONDecodeError:
-                        msg = ("The client provided invalid json:"
-                               " json='{}'".format(value))
-                        print("  * ERROR: " + msg)
-                        res = {"error": msg}
-                        res_bytes = json.dumps(res).encode()
-                        self.send(res_bytes)
-                    except pypicolcd.DisconnectedError:
-                        msg = ("No known picoLCD USB device is"
-                               " connected to the server.")
-                        # print("* ERROR: {}".format(msg))
-                        # NOTE: push_action usually shows the error
-                        res = {"error": msg}
-                        res_bytes = json.dumps(res).encode()
-                        self.send(res_bytes)
-                    except ValueError as e:
-                        msg = str(e)
-                        res = {"error": msg}
-                        res_bytes = json.dumps(res).encode()
-                        self.send(res_bytes)
-                else:
-                    params[name] = value
-            # try:
-            #     req = json.loads(req_s)
-            #     res = self.service.push_action(req)
-            #     res_bytes = json.dumps(res).encode()
-            #     self.send(res_bytes)
-            # except json.decoder.JSONDecodeError:
-            #     print("* the client provided invalid json:"
-            #           " '{}'".format(req_s))
-        else:
-            raise ValueError("reroute_get can only handle strings"
-                             " starting with 'GET /'")
-
-
-# See https://docs.python.org/2/library/asyncore.html
-class LCDServer(asyncore.dispatcher):
-    def __init__(self, host, port, service):
-        asyncore.dispatcher.__init__(self)
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.set_reuse_addr()
-        self.bind((host, port))
-        self.listen(5)
-        print("* lcd-fb is listening on {}:{}".format(host, port))
-        self.service = service
+    def __init__(self, status, msg, close_enable=False):
+        """
+        Keyword arguments:
+        close_enable -- close the connection after the response (if
+            the rest of the request can't be read, such as if it is
+            too long)
+        """
+        Exception.__init__(self, msg)
+        self.status = status
+        self.close_enable = close_enable
+
+
+class BatchError(Exception):
+    """
+    An action of a batch failed, so the batch was undone (see
+    LCDFramebufferServer.push_batch).
+    """
+
+    def __init__(self, status, msg, results):
+        """
+        Sequential arguments:
+        status -- the HTTP status of the failed action
+        msg -- the error message
+        results -- the response to each action of the batch
+        """
+        Exception.__init__(self, msg)
+        self.status = status
+        self.results = results
+
+
+def get_error_response(e, where):
+    """
+    Get the (status, response) tuple for an exception that a function
+    of the service (named where, for the log) raised.
+    """
+    if isinstance(e, pypicolcd.DisconnectedError):
+        # NOTE: push_action usually shows the error
+        return 503, {"error": ("No known picoLCD USB device is"
+                               " connected to the server.")}
+    if isinstance(e, ValueError):
+        return 400, {"error": str(e)}
+    print("  * ERROR in {}: {}".format(where, e))
+    pypicolcd.view_traceback(indent="  ")
+    return 500, {"error": "{}: {}".format(type(e).__name__, e)}
+
+
+class LCDRequest:
+    """
+    An HTTP request (see LCDRequestHandler.read_request).
+    """
+
+    def __init__(self, method, target, version, headers, body=b""):
+        self.method = method
+        self.version = version
+        self.headers = headers  # lowercase names
+        self.body = body
+        self.path, _, query = target.partition("?")
+        # The list of values of each parameter, in order:
+        self.params = {}
+        for chunk in query.split("&"):
+            if not chunk:
+                continue
+            name, _, value = chunk.partition("=")
+            self.params.setdefault(unquote(name), []).append(
+                unquote(value)
+            )
+
+    def is_legacy(self):
+        """
+        Check whether this is a request from a client older than HTTP
+        responses (an HTTP/1.0 GET with no headers, see
+        lcdclient.py), which gets only the JSON as the response.
+        """
+        return ((self.method == "GET") and (self.version == "HTTP/1.0")
+                and (not self.headers) and ("json" in self.params))
+
+    def is_keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def get_int(self, name):
+        values = self.params.get(name)
+        if not values:
+            raise HTTPError(400, "The {} parameter is required."
+                                 "".format(name))
         try:
-            systemd.daemon.notify('READY=1')
-        except NameError:
-            # The systemd module did not import.
+            return int(values[0])
+        except ValueError:
+            raise HTTPError(400, "The {} parameter must be an integer"
+                                 " but is '{}'.".format(name, values[0]))
+
+
+class LCDRequestHandler:
+    """
+    Answer the requests of one client connection, one at a time: the
+    next request is not read until the response to the previous one
+    is sent, so a client that sends faster than the LCD draws waits
+    (TCP flow control) instead of filling the server's memory.
+
+    Requests:
+    GET /?json=<action> -- run an action (URL-encoded JSON, see
+        LCDFramebufferServer.push_action)
+    POST / -- run an action sent as the JSON body
+    POST /batch -- run a JSON list of actions as one transaction (see
+        LCDFramebufferServer.push_batch)
+    POST /blit?x=<x>&y=<y>&width=<w>&height=<h> -- draw the body as a
+        1-bit bitmap (see PicoLCD.blit, which also accepts the op and
+        layout parameters)
+
+    Each response is JSON with a "status" of "OK", or an "error".
+    """
+
+    def __init__(self, reader, writer, server):
+        self.reader = reader
+        self.writer = writer
+        self.server = server
+        self.service = server.service
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    req = await self.read_request()
+                except HTTPError as e:
+                    print("  * ERROR: {}".format(e))
+                    await self.send(e.status, {"error": str(e)},
+                                    keep_alive=not e.close_enable)
+                    if e.close_enable:
+                        break
+                    continue
+                if req is None:
+                    # The client closed the connection.
+                    break
+                if req.is_legacy():
+                    for value in req.params["json"]:
+                        status, res = await self.run_json(value)
+                        await self.send_legacy(res)
+                    continue
+                keep_alive = req.is_keep_alive()
+                try:
+                    status, res = await self.route(req)
+                except HTTPError as e:
+                    print("  * ERROR: {}".format(e))
+                    status, res = e.status, {"error": str(e)}
+                await self.send(status, res, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
             pass
+        finally:
+            self.writer.close()
+
+    async def read_request(self):
+        """
+        Read the next request (the body is read according to
+        Content-Length).
+
+        Returns:
+            an LCDRequest, or None if the client closed the connection
+        """
+        try:
+            head = await self.reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HTTPError(400, "The request ended before the"
+                                     " end of the headers.",
+                                close_enable=True)
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "The request line and headers are"
+                                 " longer than {} bytes."
+                                 "".format(self.server.request_max),
+                            close_enable=True)
+        lines = head.decode("latin-1").split("\r\n")
+        words = lines[0].split(" ")
+        if (len(words) != 3) or (not words[2].startswith("HTTP/")):
+            raise HTTPError(400, "The request line is not valid:"
+                                 " '{}'".format(lines[0]),
+                            close_enable=True)
+        method, target, version = words
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise HTTPError(400, "A header is not valid: '{}'"
+                                     "".format(line),
+                                close_enable=True)
+            headers[name.strip().lower()] = value.strip()
+        if "transfer-encoding" in headers:
+            raise HTTPError(501, "Transfer-Encoding is not supported"
+                                 " (send Content-Length instead).",
+                            close_enable=True)
+        body = b""
+        length_s = headers.get("content-length")
+        if length_s is not None:
+            try:
+                length = int(length_s)
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise HTTPError(400, "Content-Length is not valid: '{}'"
+                                     "".format(length_s),
+                                close_enable=True)
+            if length > self.server.body_max:
+                raise HTTPError(413, "The body is longer than {} bytes."
+                                     "".format(self.server.body_max),
+                                close_enable=True)
+            try:
+                body = await self.reader.readexactly(length)
+            except asyncio.IncompleteReadError:
+                return None
+        elif method == "POST":
+            raise HTTPError(411, "POST requires Content-Length.",
+                            close_enable=True)
+        return LCDRequest(method, target, version, headers, body)
+
+    async def route(self, req):
+        """
+        Run a request (see the class docstring).
+
+        Returns:
+            the (status, response) tuple
+        """
+        if req.path == "/":
+            if req.method == "GET":
+                values = req.params.get("json")
+                if not values:
+                    return 200, {"status": "OK",
+                                 "info": self.service.get_usage()}
+                return await self.run_json(values[0])
+            if req.method == "POST":
+                return await self.run_json(req.body)
+            raise HTTPError(405, "/ only accepts GET and POST.")
+        if req.path == "/batch":
+            if req.method != "POST":
+                raise HTTPError(405, "/batch only accepts POST.")
+            actions = self.load_json(req.body)
+            if not isinstance(actions, list):
+                raise HTTPError(400, "The batch must be a JSON list of"
+                                     " actions.")
+            return await self.server.run(self.service.push_batch,
+                                         actions)
+        if req.path == "/blit":
+            if req.method != "POST":
+                raise HTTPError(405, "/blit only accepts POST.")
+            x = req.get_int("x")
+            y = req.get_int("y")
+            size = (req.get_int("width"), req.get_int("height"))
+            op = req.params.get("op", ["copy"])[0]
+            layout = req.params.get("layout", ["rows"])[0]
+            return await self.server.run(self.service.push_blit,
+                                         (x, y), req.body, size, op,
+                                         layout)
+        raise HTTPError(404, "{} was not found.".format(req.path))
+
+    def load_json(self, value):
+        """
+        Parse JSON (a str or UTF-8 bytes), raising HTTPError if it is
+        not valid.
+        """
+        try:
+            return json.loads(value)
+        except (TypeError, ValueError):
+            # (json.decoder.JSONDecodeError is a ValueError, and so
+            # is UnicodeDecodeError.)
+            if isinstance(value, bytes):
+                value = value.decode(errors="replace")
+            raise HTTPError(400, "The client provided invalid json:"
+                                 " json='{}'".format(value))
+
+    async def run_json(self, value):
+        """
+        Run an action from JSON (a str or UTF-8 bytes).
+
+        Returns:
+            the (status, response) tuple
+        """
+        try:
+            action = self.load_json(value)
+        except HTTPError as e:
+            print("  * ERROR: {}".format(e))
+            return e.status, {"error": str(e)}
+        if not isinstance(action, dict):
+            return 400, {"error": "The action must be a JSON object."}
+        return await self.server.run_queued(action)
+
+    async def send(self, status, res, keep_alive=True):
+        body = json.dumps(res).encode()
+        head = ("HTTP/1.1 {} {}\r\n"
+                "Content-Type: application/json\r\n"
+                "Content-Length: {}\r\n"
+                "Connection: {}\r\n"
+                "\r\n".format(status, STATUS_REASONS.get(status, ""),
+                              len(body),
+                              "keep-alive" if keep_alive else "close"))
+        self.writer.write(head.encode() + body)
+        await self.writer.drain()
+
+    async def send_legacy(self, res):
+        self.writer.write(json.dumps(res).encode())
+        await self.writer.drain()
+
+
+class LCDServer:
+    """
+    Accept lcd-fb clients using asyncio. Requests are read and parsed
+    by the event loop, but push_action (which draws and may wait for
+    USB, such as for the flash command) runs in a one-thread executor,
+    so that clients are still accepted and read while the LCD is busy.
+    """
+
+    def __init__(self, host, port, service, max_pending=16,
+                 request_max=JSON_MAX, body_max=BODY_MAX):
+        """
+        Sequential arguments:
+        host, port -- where to listen
+        service -- the LCDFramebufferServer that runs the actions
+
+        Keyword arguments:
+        max_pending -- how many actions may wait for the executor
+            (after that, requests are not read until one finishes)
+        request_max -- the longest request line and headers (in bytes)
+            to accept
+        body_max -- the longest body (in bytes) to accept
+        """
+        self.host = host
+        self.port = port
+        self.service = service
+        self.max_pending = max_pending
+        self.request_max = request_max
+        self.body_max = body_max
+        self._pending = None  # an asyncio.Semaphore (see serve_forever)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="lcd-fb action",
+        )
+        self._server = None
 
     def blab(self, msg):
         if self.service is not None:
             if self.service.p is not None:
-                self.service.p.blab(msg)
+                self.service.p.blab(msg, where="LCDServer")
 
-    def handle_accept(self):
-        pair = self.accept()
-        if pair is not None:
+    async def serve_forever(self):
+        """
+        Listen (raising OSError if the port can't be bound) and answer
+        clients until cancelled.
+        """
+        self._pending = asyncio.Semaphore(self.max_pending)
+        self._server = await asyncio.start_server(
+            self.handle_accept,
+            self.host,
+            self.port,
+            limit=self.request_max,
+        )
+        print("* lcd-fb is listening on {}:{}".format(self.host,
+                                                      self.port))
+        try:
+            systemd.daemon.notify('READY=1')
+        except NameError:
+            # The systemd module did not import.
+            pass
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self._executor.shutdown(wait=False)
+
+    async def handle_accept(self, reader, writer):
+        if self.service.p.trace_level >= pypicolcd.TRACE_DEBUG:
             now = datetime.now()
             now_s = now.strftime("%Y-%m-%d %H:%M:%S")
-            sock, addr = pair
-            self.blab("{}: Incoming connection from"
-                      " {}".format(now_s, repr(addr)))
-            handler = LCDRequestHandler(sock, self.service)
+            self.blab("{}: Incoming connection from {}".format(
+                now_s, repr(writer.get_extra_info("peername"))))
+        handler = LCDRequestHandler(reader, writer, self)
+        await handler.run()
+
+    async def run(self, function, *args):
+        """
+        Run a function of the service that draws (such as push_action)
+        in the executor.
+
+        Returns:
+            the (status, response) tuple, where the response has an
+            "error" key if the function failed
+        """
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call,
+                                              function, args)
+
+    async def run_queued(self, action):
+        """
+        Queue an action (see LCDFramebufferServer.queue_action) and
+        run the queue in the executor.
+
+        Returns:
+            the (status, response) tuple
+        """
+        async with self._pending:
+            future = self.service.queue_action(action)
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(self._executor, self.service.run_queue)
+            return await asyncio.wrap_future(future)
+
+    def _call(self, function, args):
+        try:
+            return 200, function(*args)
+        except BatchError as e:
+            return e.status, {"error": str(e), "results": e.results}
+        except Exception as e:
+            return get_error_response(e, function.__name__)
 
 
 # See <https://stackoverflow.com/questions/12435211/
@@ -225,95 +547,161 @@ class KeepAliveThread(Thread):
         Thread.__init__(self)
         self.stopEvent = stopEvent
         self.lfbs = lcd_framebuffer_server
-        self.prev_ready = self.lfbs.p.ready()
         self.prev_msg = None
+        self.hotplug = HotplugMonitor(
+            [(VENDOR_ID, int(product)) for product in DC_DICT]
+        )
+        self.plugged = False  # whether a uevent said the LCD was added
+
+    def _wait(self):
+        """
+        Wait for the next check, but wake early if the LCD is plugged
+        in while waiting for it (when uevents are available) or when
+        the next reconnect attempt is due (see
+        PicoLCD.get_reconnect_delay).
+
+        Returns:
+            True if the thread should stop
+        """
+        p = self.lfbs.p
+        self.plugged = False
+        if p.ready():
+            return self.stopEvent.wait(2.0)
+        timeout = min(max(p.get_reconnect_delay(), .1), 2.0)
+        if self.hotplug.get_method() == "netlink":
+            self.plugged = self.hotplug.wait(timeout)
+            return self.stopEvent.is_set()
+        return self.stopEvent.wait(timeout)
 
     def run(self):
         print("* The KeepAliveThread started.")
         try:
-            while not self.stopEvent.wait(2.0):
+            while not self._wait():
                 if self.lfbs.clockThread is None:
                     if not self.lfbs.stopFlag.is_set():
                         # ^ Purposely check the flag for the OTHER
                         # thread, since the following restarts that one:
-                        self.prev_ready = False  # why: error ends clock
                         print("* KeepAlive is restarting"
                               " the draw timer...")
                         self.lfbs._run_clock()
-                if not self.prev_ready:
-                    try:
-                        msg = None
-                        if not self.lfbs.p.ready():
-                            msg = ("* KeepAlive is reconnecting"
-                                   " the LCD...")
-                            if msg != self.prev_msg:
-                                print(msg)
-                                self.prev_msg = msg
-                            else:
-                                msg = None
-                            self.lfbs.p.reconnect(silent=True)
-                        if self.lfbs.p.ready():
-                            if msg is None:
-                                print(self.prev_msg)  # say reconnecting
-                            self.prev_msg = None
-                            print("  * OK. Refreshing...")
-                            self.lfbs.p.refresh(enable_reconnect=False)
-                            self.prev_ready = True
-                    except pypicolcd.DisconnectedError:
-                        print("  * FAILED")
-                        pass
+                p = self.lfbs.p
+                if p.ready():
+                    self.prev_msg = None
+                    continue
+                if (not self.plugged) and \
+                        (self.hotplug.is_present() is False):
+                    # Don't scan the USB buses for nothing.
+                    continue
+                msg = "* KeepAlive is reconnecting the LCD..."
+                if msg != self.prev_msg:
+                    print(msg)
+                    self.prev_msg = msg
+                if self.plugged:
+                    # It was just plugged in, so don't wait for the
+                    # backoff delay.
+                    connected = p.reconnect(silent=True)
+                else:
+                    connected = p.try_reconnect(silent=True)
+                if connected:
+                    # reconnect already wrote the whole framebuffer.
+                    print("  * OK")
         except Exception as e:
             print("* KeepAlive error: {}".format(e))
             print(sys.exc_info()[0])
         finally:
             print("* KeepAlive ended.")
+            self.hotplug.close()
             self.lfbs.keepAliveThread = None
 
 
-def get_bool_options():
-    return bool_options
-
-
-def get_commands():
-    return allowed_commands
-
-
-config_help = {
-    "verbose": "Write everything to the server console.",
-    "clock": ("Turn the clock on or off (pass x"
-              " and/or y along with the clock"
-              " option to change its position)."),
-    "background": ("Specify the path to an image"
-                   " to draw before the text."),
-    "foreground": ("Specify the path to an image"
-                   " to draw after the text."),
-    "backlight": "Set the LCD backlight level (0 to 255).",
-    "lines": ("Provide a list of lines that"
-              " should display on the screen,"
-              " where the next line should wrap"
-              " to line under the first."),
-    "font": ("Provide the name of a built-in"
-             " font (case-insensitive): "
-             + " ".join(PicoLCD.get_font_names())),
-    "x": "Set the x location for this command.",
-    "y": "Set the y location for this command.",
-    "clear": "Clear the entire display.",
-    "flash": ("Flash the display off to get the"
-              " viewer's attention."),
-    "push": ("Push text from left to right, then"
-             " scroll the display when more text"
-             " is written after reaching the"
-             " end."),
-    "help": "Show a list of options.",
-    "refresh": ("Draw the buffer (such as in"
-                " case the device disconnected"
-                " without the framebuffer"
-                " knowing nor invalidating based"
-                " on that knowledge).")
-}
+def parse_bounds(bounds):
+    """
+    Get a rect in ((min_x, min_y), (max_x+1, max_y+1)) format from the
+    bounds option ("x,y,width,height" or a list of those numbers).
+    """
+    parts = bounds
+    if isinstance(bounds, str):
+        parts = bounds.split(",")
+    try:
+        x, y, w, h = (int(part) for part in parts)
+    except (TypeError, ValueError):
+        raise ValueError("The bounds must be x,y,width,height but are"
+                         " '{}'.".format(bounds))
+    return ((x, y), (x + w, y + h))
+
 
+class Layer:
+    """
+    A named part of the display with its own back buffer, so that
+    drawing to one layer doesn't change the others (see
+    LCDFramebufferServer.get_layer). The layers are composited into
+    the framebuffer in z order (see LCDFramebufferServer.composite).
+    """
 
-class LCDFramebufferServer(asyncore.dispatcher_with_send):
+    def __init__(self, name, buffer, rect, z=0):
+        """
+        Sequential arguments:
+        name -- the name that actions use (the layer option)
+        buffer -- the back buffer: an OffscreenBuffer the size of the
+            display (so drawing to it uses the same x and y as the LCD,
+            see PicoLCD.draw_to)
+        rect -- the part of the buffer to show (see set_rect)
+
+        Keyword arguments:
+        z -- layers with a higher z are in front of the others
+        """
+        self.name = name
+        self.buffer = buffer
+        self.rect = None
+        self.z = z
+        self.set_rect(rect)
+
+    def set_rect(self, rect):
+        """
+        Set the bounds in ((min_x, min_y), (max_x+1, max_y+1)) format.
+        They must be inside of the display, and the top and bottom must
+        be on the edge of a row of blocks (multiples of 8), since the
+        layer is composited a framebuffer byte at a time.
+        """
+        (min_x, min_y), (end_x, end_y) = rect
+        w = self.buffer.get_width()
+        h = self.buffer.get_height()
+        if ((min_x < 0) or (min_y < 0) or (end_x > w) or (end_y > h)
+                or (min_x >= end_x) or (min_y >= end_y)):
+            raise ValueError("The bounds of layer {} must be inside of the"
+                             " {}x{} display but are {}."
+                             "".format(self.name, w, h, rect))
+        ppb = self.buffer.dc["ppb"]
+        if (min_y % ppb != 0) or (end_y % ppb != 0):
+            raise ValueError("The y and height of layer {} must be"
+                             " multiples of {} but are {} and {}."
+                             "".format(self.name, ppb, min_y,
+                                       end_y - min_y))
+        self.rect = ((min_x, min_y), (end_x, end_y))
+
+    def get_size(self):
+        (min_x, min_y), (end_x, end_y) = self.rect
+        return (end_x - min_x, end_y - min_y)
+
+    def get_pages(self):
+        """
+        Get the part of the buffer inside of the bounds in the "pages"
+        layout (see PicoLCD.blit).
+        """
+        (min_x, min_y), (end_x, end_y) = self.rect
+        fb = self.buffer.data
+        pitch = self.buffer.get_width()
+        ppb = self.buffer.dc["ppb"]
+        return b"".join(fb[page*pitch+min_x:page*pitch+end_x]
+                        for page in range(min_y // ppb, end_y // ppb))
+
+    def overlaps(self, rect):
+        (min_x, min_y), (end_x, end_y) = self.rect
+        return ((min_x < rect[1][0]) and (rect[0][0] < end_x)
+                and (min_y < rect[1][1]) and (rect[0][1] < end_y))
+
+
+class LCDFramebufferServer:
 
 
     def __init__(self, logger=None):
@@ -321,7 +709,12 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
         self.keepAliveThread = None
         self.stopFlag = Event()
         self.noKeepAlive = Event()
-        self.p = PicoLCD()
+        # Drawing returns without waiting for USB (see flush):
+        self.p = PicoLCD(async_enable=True)
+        # Only the KeepAlive thread reconnects, so requests never wait
+        # for USB while the LCD is missing (drawing only changes the
+        # framebuffer, which KeepAlive writes after reconnecting):
+        self.p.auto_reconnect_enable = False
         if logger is None:
             logging.getLogger('lcd-fb')
         else:
@@ -334,7 +727,18 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
         # x=159 leaves just enough room for "____-%m-%d %H:%M:%S"
         self.config_help = {}
         self.allowed_names = ["background", "foreground", "backlight",
-                              "lines", "font", "x", "y"]
+                              "lines", "font", "x", "y", "trace",
+                              "layer", "bounds", "z"]
+        self.layers = {}  # Layer instances by name (see get_layer)
+        # Held while an action runs or the layers are composited:
+        self._layers_lock = RLock()
+        # Actions waiting to run, by the key from get_update_key (or
+        # a number if they can't be replaced), see queue_action:
+        self._queue = OrderedDict()
+        self._queue_lock = Lock()
+        self.updates_queued = 0
+        self.updates_dropped = 0  # replaced before they ran
+        self.queue_depth_max = 0
         self._run_clock()
         self._run_keep_alive()
 
@@ -352,18 +756,7 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
 
     @staticmethod
     def get_usage():
-        s = ""
-        s += "==================== Usage ===================="
-        s += ("\nParams should be followed by an equal sign"
-              " except for booleans and commands, which will be set to"
-              " true automatically.")
-        s += "\nParams:"
-        for k, v in config_help.items():
-            s += "\n--" + k
-            s += "\n  " + v
-        # s += "\n"
-        # s += "\nExample:"
-        return s
+        return get_usage()
 
     def update_clock(self):
         if self.enable_clock:
@@ -375,33 +768,266 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
             if (now_s != self.prev_clock_s) or reconnected:
                 if self.p.ready():
                     self.prev_enable_clock = self.enable_clock
-                    result = self.p.draw_text_at(
-                        self.time_pos,
-                        now_s,
-                        erase_behind_enable=True
-                    )
-                    # print("* drawing clock finished:"
-                    #       " {}".format(result))
-                    # TODO: result should be rect (?), not None.
+                    with self._layers_lock:
+                        layer = self._get_clock_layer()
+                        if layer is not None:
+                            with self.p.draw_to(layer.buffer):
+                                self.p.draw_text_at(
+                                    self.time_pos,
+                                    now_s,
+                                    erase_behind_enable=True,
+                                    refresh_enable=False
+                                )
+                            self.composite(layer)
+                            self.p.refresh()
                     self.prev_clock_dt = now
                     self.prev_clock_s = now_s
         elif self.prev_enable_clock:
             if self.p.ready():
-                # result = self.p.draw_text_at(self.time_pos, now_s,
-                #                              erase_behind_enable=True)
-                # TODO: use the rect from draw_text_at
-                self.p.draw_rect((self.time_pos, (256, 8)), False,
-                                 filled=True)
+                with self._layers_lock:
+                    if CLOCK_LAYER in self.layers:
+                        self.remove_layer(CLOCK_LAYER)
+                        self.p.refresh()
                 self.prev_enable_clock = False
 
+    def _get_clock_layer(self):
+        """
+        Get the layer of the clock, which is one line of the default
+        font high (extended to the rows of blocks that the line touches)
+        from time_pos to the right edge of the display.
+
+        Returns:
+            the layer, or None if time_pos is off of the display (or the
+            display isn't connected yet)
+        """
+        dc = self.p.dc
+        if dc is None:
+            return None
+        ppb = dc["ppb"]
+        meta = get_font_meta(self.p.default_font)
+        x, y = (int(v) for v in self.time_pos)
+        min_x = max(x, 0)
+        min_y = max(y, 0) // ppb * ppb
+        end_x = dc["width"]
+        end_y = min(y + meta["default_size"], dc["height"])
+        end_y = (end_y + ppb - 1) // ppb * ppb
+        layer = self.layers.get(CLOCK_LAYER)
+        if (min_x >= end_x) or (min_y >= end_y):
+            if layer is not None:
+                self.remove_layer(CLOCK_LAYER)
+            return None
+        rect = ((min_x, min_y), (end_x, end_y))
+        if (layer is not None) and (layer.rect != rect):
+            # It moved, so start with a blank buffer.
+            self.remove_layer(CLOCK_LAYER)
+        return self.get_layer(CLOCK_LAYER, z=CLOCK_Z,
+                              bounds=(min_x, min_y, end_x - min_x,
+                                      end_y - min_y))
+
+    def get_layer(self, name, bounds=None, z=None):
+        """
+        Get a layer (see Layer), creating it if it doesn't exist yet
+        (then bounds are required), and move it if bounds or z are not
+        None.
+
+        Keyword arguments:
+        bounds -- "x,y,width,height" (or a list of those numbers)
+        z -- layers with a higher z are in front of the others
+        """
+        rect = None
+        if bounds is not None:
+            rect = parse_bounds(bounds)
+        if z is not None:
+            z = int(z)
+        with self._layers_lock:
+            layer = self.layers.get(name)
+            if layer is None:
+                if rect is None:
+                    raise ValueError("Layer {} doesn't exist, so the"
+                                     " bounds option is required."
+                                     "".format(name))
+                if self.p.dc is None:
+                    # The size of the back buffer isn't known yet.
+                    raise pypicolcd.DisconnectedError(
+                        "Layer {} can't be created before the display"
+                        " connects.".format(name)
+                    )
+                if self.p.dc["type"] != "graphics":
+                    raise ValueError("Layers require a graphics"
+                                     " display.")
+                layer = Layer(name, OffscreenBuffer(self.p.dc), rect,
+                              z=z if z is not None else 0)
+                self.layers[name] = layer
+                return layer
+            prev_rect = layer.rect
+            prev_z = layer.z
+            if rect is not None:
+                layer.set_rect(rect)
+            if z is not None:
+                layer.z = z
+            if (layer.rect != prev_rect) or (layer.z != prev_z):
+                self._uncover(prev_rect)
+            return layer
+
+    def remove_layer(self, name):
+        """
+        Remove a layer and erase its part of the display (except where
+        other layers are).
+        """
+        with self._layers_lock:
+            layer = self.layers.pop(name, None)
+            if layer is None:
+                raise ValueError("There is no layer {}.".format(name))
+            self._uncover(layer.rect)
+
+    def _uncover(self, rect):
+        # What was under a layer was drawn over, so erase it.
+        self.p.draw_rect(rect, False, refresh_enable=False)
+        self.composite()
+
+    def composite(self, layer=None):
+        """
+        Copy the layers into the framebuffer in z order (layers with the
+        same z are in the order they were created). Only the bytes that
+        changed are invalidated, so refresh only writes what changed.
+
+        Keyword arguments:
+        layer -- only composite this layer and the layers in front of
+            it that overlap it (if None, composite all of them)
+        """
+        with self._layers_lock:
+            layers = sorted(self.layers.values(),
+                            key=lambda other: other.z)
+            if layer is not None:
+                i = layers.index(layer)
+                layers = [layer] + [other for other in layers[i+1:]
+                                    if other.overlaps(layer.rect)]
+            for other in layers:
+                self.p.blit(other.rect[0], other.get_pages(),
+                            other.get_size(), layout="pages",
+                            refresh_enable=False)
+
+    def get_update_key(self, action):
+        """
+        Get the region that an action draws over, or None if it can't
+        be replaced by a newer action (if it has options besides
+        UPDATE_NAMES, such as a command or an image). The region of the
+        lines (see show_lines) is from x to the right edge of the
+        display (in the layer if there is one) and from y to the bottom
+        of the last line, so actions that draw lines over the same
+        region get the same key even if the text or font differs.
+
+        Returns:
+            a (layer, x, y, end_y) tuple, where layer is None for the
+            framebuffer, or None
+        """
+        lines = action.get("lines")
+        if (not isinstance(lines, list)) or (len(lines) < 1):
+            return None
+        for name in action.keys():
+            if name not in UPDATE_NAMES:
+                return None
+        font = action.get("font")
+        if font is None:
+            font = self.p.default_font
+        meta = get_font_meta(font)
+        if meta is None:
+            return None
+        try:
+            x = int(action.get("x") or 0)
+            y = int(action.get("y") or 0)
+        except (TypeError, ValueError):
+            # push_action shows the error.
+            return None
+        layer_name = action.get("layer")
+        if layer_name is not None:
+            layer_name = str(layer_name)
+        end_y = y + 8 * (len(lines) - 1) + meta["default_size"]
+        return (layer_name, x, y, end_y)
+
+    def queue_action(self, action):
+        """
+        Add an action to the queue (see run_queue). If an action with
+        the same key (see get_update_key) is still waiting, it is
+        dropped, so only the newest content for a region of the LCD is
+        drawn, and the queue stays short even if producers send updates
+        faster than the LCD is written.
+
+        Returns:
+            a concurrent.futures.Future of the (status, response) tuple,
+            where the response of a dropped action has "superseded"
+        """
+        future = Future()
+        key = self.get_update_key(action)
+        with self._queue_lock:
+            self.updates_queued += 1
+            if key is None:
+                key = self.updates_queued
+            prev = self._queue.pop(key, None)
+            self._queue[key] = (action, future)
+            self.queue_depth_max = max(self.queue_depth_max,
+                                       len(self._queue))
+            if prev is not None:
+                self.updates_dropped += 1
+        if prev is not None:
+            prev_future = prev[1]
+            if prev_future.set_running_or_notify_cancel():
+                prev_future.set_result(
+                    (200, {"status": "OK", "superseded": True})
+                )
+        return future
+
+    def run_queue(self):
+        """
+        Run the queued actions (see queue_action) in order until the
+        queue is empty.
+        """
+        while True:
+            with self._queue_lock:
+                if not self._queue:
+                    return
+                _, (action, future) = self._queue.popitem(last=False)
+            if not future.set_running_or_notify_cancel():
+                # The server is stopping.
+                continue
+            try:
+                result = (200, self.push_action(action))
+            except Exception as e:
+                result = get_error_response(e, "push_action")
+            future.set_result(result)
+
+    def get_queue_stats(self):
+        """
+        Get counters of the queue (see queue_action): its depth now and
+        at most, how many actions were queued, and how many were
+        dropped since a newer action replaced them.
+        """
+        with self._queue_lock:
+            return {
+                "depth": len(self._queue),
+                "depth_max": self.queue_depth_max,
+                "queued": self.updates_queued,
+                "dropped": self.updates_dropped,
+            }
+
     def push_action(self, action):
         """
         Process an action dictionary, such as URL params or command line
         params, in either case reduced to names and values.
+
+        The drawing options (such as lines and clear) draw to the layer
+        named by the layer option (see get_layer) if there is one, and
+        the LCD is written once at the end (see PicoLCD.frame) after
+        compositing the layers (see composite).
         """
-        prev_verbose = self.p.verbose_enable
+        with self._layers_lock:
+            with self.p.frame():
+                return self._push_action(action)
+
+    def _push_action(self, action):
+        # The verbose option only applies to this action:
+        prev_trace_level = self.p.trace_level
         res = {}
-        lines = action.get("lines")
         for name, value in action.items():
             if name == "lines":
                 pass
@@ -412,14 +1038,32 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
             elif name in allowed_commands:
                 action[name] = True
             else:
-                self.p.verbose_enable = prev_verbose
                 raise ValueError("{} is an unknown option (value"
                                  " '{}').".format(name, value))
-        if action.get("clear") is True:
-            self.p.clear()
+        layer = None
+        layer_name = action.get("layer")
+        if layer_name is not None:
+            if action.get("remove_layer") is True:
+                self.remove_layer(layer_name)
+            else:
+                layer = self.get_layer(layer_name,
+                                       bounds=action.get("bounds"),
+                                       z=action.get("z"))
+        elif ((action.get("bounds") is not None)
+                or (action.get("z") is not None)
+                or (action.get("remove_layer") is True)):
+            raise ValueError("The bounds, z and remove_layer options"
+                             " require the layer option.")
         if action.get("refresh") is True:
+            # Rewrite everything even if it matches what was last
+            # written, since the device may have been reset:
+            self.p.forget_device_state()
             self.p.invalidate()
             self.p.refresh()
+        trace = action.get("trace")
+        if trace is not None:
+            prev_trace_level = int(trace)
+            self.p.set_trace(prev_trace_level)
         verbose = action.get("verbose")
         if verbose is not None:
             self.p.verbose_enable = verbose
@@ -438,17 +1082,53 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
             # print("* setting backlight to {}...".format(b))
             self.p.set_backlight(b)
 
-        image_path = action.get("foreground")
-        x = action.get("x")
-        y = action.get("y")
         clock = action.get("clock")
         if clock is not None:
             clock = to_bool(clock)
             self.enable_clock = clock
-            if x is not None:
-                self.time_pos[0] = x
-            if y is not None:
-                self.time_pos[1] = y
+            if action.get("x") is not None:
+                self.time_pos[0] = action["x"]
+            if action.get("y") is not None:
+                self.time_pos[1] = action["y"]
+        if layer is None:
+            self._draw_action(action)
+        else:
+            with self.p.draw_to(layer.buffer):
+                self._draw_action(action, layer=layer)
+        self.composite(layer)
+
+        if action.get("flash") is True:
+            self.p.flash()
+            self.p.flash()
+
+        res["status"] = "OK"
+        if action.get("help") is True:
+            res["info"] = self.get_usage()
+        if action.get("stats") is True:
+            res["stats"] = {"queue": self.get_queue_stats(),
+                            "lcd": self.p.get_stats()}
+        self.p.trace_level = prev_trace_level
+        return res
+
+    def _draw_action(self, action, layer=None):
+        """
+        Draw the clear, background, lines and foreground options of an
+        action (see push_action) without refreshing.
+
+        Keyword arguments:
+        layer -- the layer that self.p draws to (see PicoLCD.draw_to),
+            or None if it draws to the framebuffer
+        """
+        if action.get("clear") is True:
+            if layer is None:
+                self.p.clear()
+            else:
+                layer.buffer.clear()
+        lines = action.get("lines")
+        font = action.get("font")
+        x = action.get("x")
+        y = action.get("y")
+        image_path = action.get("background")
         if image_path is not None:
             self.show_image(image_path)
         if action.get("push") is True:
@@ -467,7 +1147,7 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
                 if lines is not None:
                     all_text = " ".join(lines)
                     print("* pushing {}...".format(all_text))
-                    self.p.push_text(all_text)
+                    self.p.push_text(all_text, refresh_enable=False)
                     # for line in lines:
                     #     self.p.push_text(line)
             except pypicolcd.DisconnectedError as e:
@@ -479,15 +1159,71 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
         if image_path is not None:
             self.show_image(image_path)
 
-        if action.get("flash") is True:
-            self.p.flash()
-            self.p.flash()
+    def push_batch(self, actions):
+        """
+        Run a list of actions (see push_action) as one transaction: the
+        LCD is written once after the last action (see PicoLCD.frame),
+        so the steps in between never appear. If an action fails, the
+        rest are skipped and the framebuffer (and the back buffer of
+        each layer) is restored to how it was before the batch (other
+        effects, such as of the backlight, clock or flash options, or
+        adding or removing layers, are not undone).
 
-        res["status"] = "OK"
-        if action.get("help") is True:
-            res["info"] = self.get_usage()
-        self.p.verbose_enable = prev_verbose
-        return res
+        Returns:
+            the response, where "results" is the response to each
+            action (BatchError has them if an action failed)
+        """
+        with self._layers_lock:
+            return self._push_batch(actions)
+
+    def _push_batch(self, actions):
+        results = []
+        failure = None  # (index, status, error) of the failed action
+        snapshot = None
+        if self.p.framebuffer is not None:
+            snapshot = bytes(self.p.framebuffer)
+        buffer_snapshots = {name: bytes(layer.buffer.data)
+                            for name, layer in self.layers.items()}
+        with self.p.frame():
+            for i, action in enumerate(actions):
+                if failure is not None:
+                    results.append({"error": "Action {} failed, so this"
+                                             " was skipped."
+                                             "".format(failure[0])})
+                    continue
+                try:
+                    if not isinstance(action, dict):
+                        raise ValueError("Each action must be a JSON"
+                                         " object.")
+                    results.append(self.push_action(action))
+                except Exception as e:
+                    status, res = get_error_response(e, "push_batch")
+                    results.append(res)
+                    failure = (i, status, res["error"])
+            if failure is not None:
+                for name, buffer_snapshot in buffer_snapshots.items():
+                    layer = self.layers.get(name)
+                    if layer is not None:
+                        layer.buffer.data[:] = buffer_snapshot
+                self._restore_framebuffer(snapshot)
+        if failure is not None:
+            raise BatchError(failure[1],
+                             "Action {} of the batch failed, so the"
+                             " batch was undone: {}"
+                             "".format(failure[0], failure[2]),
+                             results)
+        return {"status": "OK", "results": results}
+
+    def _restore_framebuffer(self, snapshot):
+        fb = self.p.framebuffer
+        if (snapshot is None) or (fb is None) or \
+                (len(fb) != len(snapshot)):
+            # The device changed (so the framebuffer was reset).
+            return
+        fb[:] = snapshot
+        # Only blocks that differ from the device are written (and the
+        # clock is redrawn, see update_clock):
+        self.p.invalidate(enable_reconnect=False)
 
     def show_lines(self, lines, font=None, x=0, y=0):
         shown_count = 0
@@ -532,7 +1268,8 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
                     raise ValueError("line is None")
                 print("* showing '{}'...".format(line))
                 self.p.draw_text_at((x, y), line, font=font,
-                                    erase_behind_enable=True)
+                                    erase_behind_enable=True,
+                                    refresh_enable=False)
                 shown_count += 1
                 y += 8
             else:
@@ -542,10 +1279,27 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
         # print("* show_lines is complete. The LCD should have"
         #       " {} lines.".format(shown_count))
 
-    def show_image(self, path):
-        if not os.path.isfile(image_path):
-            raise ValueError("{} does not exist.".format(image_path))
-        self.p.draw_image((x, y), image_path, brightness=1)
+    def show_image(self, path, x=0, y=0):
+        if not os.path.isfile(path):
+            raise ValueError("{} does not exist.".format(path))
+        self.p.draw_image((int(x), int(y)), path, brightness=1,
+                          refresh_enable=False)
+
+    def push_blit(self, pos, data, size, op="copy", layout="rows"):
+        """
+        Draw a 1-bit bitmap (see PicoLCD.blit) sent by a client (under
+        the layers, see composite).
+
+        Returns:
+            the response
+        """
+        if (size[0] < 1) or (size[1] < 1):
+            raise ValueError("The width and height must be at least 1.")
+        with self._layers_lock:
+            with self.p.frame():
+                rect = self.p.blit(pos, data, size, op=op, layout=layout)
+                self.composite()
+        return {"status": "OK", "rect": rect}
 
     def handle_signal(self, signum, frame):
         # Any signal should terminate it, since the handler is only
@@ -558,6 +1312,7 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
         now = datetime.now()
         now_s = now.strftime("%Y-%m-%d %H:%M:%S")
         self.p.draw_text(2, 1, "@" + now_s)
+        self.p.flush(timeout=2.0)
         # if signum in exit_signals:
         # logging.info('* closing...')
         print("* " + msg)
@@ -565,7 +1320,6 @@ class LCDFramebufferServer(asyncore.dispatcher_with_send):
               "lcdframebuffer:LCDFramebufferServer:handle_signal...")
         self.stopFlag.set()
         self.noKeepAlive.set()
-        self.close()
         time.sleep(1)
         print("* trying to end (join) clock thread manually...")
         self.clockThread.join()
@@ -615,6 +1369,10 @@ def main():
     # how-to-exit-a-python-daemon-cleanly>
     signal.signal(signal.SIGTERM, lfbs.handle_signal)
 
+    body_max = BODY_MAX
+    if "body_max" in action:
+        body_max = int(action["body_max"])
+        del action["body_max"]
     host = action.get("localhost")
     if host is None:
         host = 'localhost'
@@ -623,25 +1381,24 @@ def main():
         print("* running as host '{}'".format(host))
     lfbs.push_action(action)
 
-    # See https://docs.python.org/2/library/asyncore.html
-    server = None
+    server = LCDServer(host, LCD_PORT, lfbs, body_max=body_max)
     try:
-        server = LCDServer(host, LCD_PORT, lfbs)
-        try:
-            asyncore.loop()
-        except Exception as e:
-            print("* asyncore.loop failed in lcdframebuffer:main:"
-                  " {}".format(e))
-        finally:
-            print("* setting stop flag in lcdframebuffer:main...")
-            lfbs.stopFlag.set()
-            print("* setting noKeepAlive flag in lcdframebuffer:main...")
-            lfbs.noKeepAlive.set()
+        asyncio.run(server.serve_forever())
     except OSError as e:
         print("Binding the LCDFramebufferServer to {}:{} failed."
               "".format(host, LCD_PORT))
         print(str(e))
-    # Ignore code below, and use the asynccore subclass above instead.
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print("* the event loop failed in lcdframebuffer:main:"
+              " {}".format(e))
+    finally:
+        print("* setting stop flag in lcdframebuffer:main...")
+        lfbs.stopFlag.set()
+        print("* setting noKeepAlive flag in lcdframebuffer:main...")
+        lfbs.noKeepAlive.set()
+    # Ignore code below, and use the asyncio server above instead.
     # See [Nischaya Sharma's Nov 29, 2018 answer edited Feb 16, 2019 by
     # Mohammad Mahjoub](https://stackoverflow.com/a/53536336)
     # on
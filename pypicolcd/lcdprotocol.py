@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+The options that lcd-fb accepts and lcd-cli sends, shared by both. This
+module only uses the standard library, so that clients start quickly
+(see the pypicolcd package, which only loads PIL and pyusb when drawing
+is used).
+Copyright (C) 2018  Jake Gustafson
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+LCD_PORT = 25664
+JSON_MAX = 8192  # the longest request line and headers lcd-fb accepts
+BODY_MAX = 262144  # the longest request body (see lcd-fb --body_max)
+bool_options = ["verbose", "clock"]
+allowed_commands = ["clear", "flash", "push", "help", "refresh",
+                    "stats", "remove_layer"]
+
+# The fonts that come with pypicolcd (pypicolcd.font_meta also has the
+# path of each):
+font_meta = {}
+font_meta["ninepin"] = {}
+font_meta["ninepin"]["filename"] = "ninepin.ttf"
+font_meta["ninepin"]["default_size"] = 8
+font_meta["zephyrean"] = {}
+font_meta["zephyrean"]["filename"] = "zephyrea.ttf"
+font_meta["zephyrean"]["default_size"] = 8
+font_meta["zephyrean"]["note"] = "smallest 8pt readable font"
+font_meta["flottflott"] = {}
+font_meta["flottflott"]["filename"] = "Flottflott.ttf"
+font_meta["flottflott"]["default_size"] = 11
+font_meta["flottflott"]["note"] = "unreadable below font size 11"
+font_meta["press start"] = {}
+font_meta["press start"]["filename"] = "prstartk.ttf"
+font_meta["press start"]["default_size"] = 6
+font_meta["press start"]["note"] = "a pixel art font readable at 6pt"
+
+config_help = {
+    "verbose": "Write everything to the server console.",
+    "trace": ("Set which messages the server writes to the console"
+              " from now on (0 for none, 1 for connecting, 2 for"
+              " drawing operations, 3 for every write to the"
+              " device)."),
+    "clock": ("Turn the clock on or off (pass x"
+              " and/or y along with the clock"
+              " option to change its position)."),
+    "background": ("Specify the path to an image"
+                   " to draw before the text."),
+    "foreground": ("Specify the path to an image"
+                   " to draw after the text."),
+    "backlight": "Set the LCD backlight level (0 to 255).",
+    "lines": ("Provide a list of lines that"
+              " should display on the screen,"
+              " where the next line should wrap"
+              " to line under the first."),
+    "font": ("Provide the name of a built-in"
+             " font (case-insensitive): "
+             + " ".join(font_meta.keys())),
+    "layer": ("Draw to this named layer instead of the display. Each"
+              " layer keeps its own pixels and only its bounds appear"
+              " (in front of layers with a lower z), so other"
+              " commands don't draw over it."),
+    "bounds": ("Create or move the layer to x,y,width,height (y and"
+               " height must be multiples of 8)."),
+    "z": ("Set the z order of the layer (higher is in front, and the"
+          " default is 0)."),
+    "remove_layer": "Remove the layer and erase its part of the display.",
+    "x": "Set the x location for this command.",
+    "y": "Set the y location for this command.",
+    "clear": "Clear the entire display.",
+    "flash": ("Flash the display off to get the"
+              " viewer's attention."),
+    "push": ("Push text from left to right, then"
+             " scroll the display when more text"
+             " is written after reaching the"
+             " end."),
+    "help": "Show a list of options.",
+    "stats": ("Show the counters of the server's queue (such as how"
+              " many updates were dropped since a newer one replaced"
+              " them) and of writing to the device."),
+    "refresh": ("Draw the buffer (such as in"
+                " case the device disconnected"
+                " without the framebuffer"
+                " knowing nor invalidating based"
+                " on that knowledge).")
+}
+
+
+def get_bool_options():
+    return bool_options
+
+
+def get_commands():
+    return allowed_commands
+
+
+def get_usage():
+    s = ""
+    s += "==================== Usage ===================="
+    s += ("\nParams should be followed by an equal sign"
+          " except for booleans and commands, which will be set to"
+          " true automatically.")
+    s += "\nParams:"
+    for k, v in config_help.items():
+        s += "\n--" + k
+        s += "\n  " + v
+    # s += "\n"
+    # s += "\nExample:"
+    return s
+
+
+def to_bool(s):
+    if s is True:  # MUST BE FIRST
+        return True
+    elif s is False:
+        return False
+    if (s is None) or (len(s) < 1):
+        raise ValueError("to_bool got a blank value.")
+    ret = None
+    s_lower = s.lower()
+    if s_lower == "false":
+        ret = False
+    elif s_lower == "0":
+        ret = False
+    elif s_lower == "no":
+        ret = False
+    elif s_lower == "off":
+        ret = False
+    else:
+        ret = True
+    return ret
@@ -0,0 +1,2986 @@
+#!/usr/bin/env python
+"""
+pypicolcd, a module for driverless writing to picoLCD (this is the part
+that draws and uses USB, which the package loads when it is first used)
+Copyright (C) 2018  Jake Gustafson
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+from datetime import datetime
+import sys
+import traceback
+import os
+import random
+import threading
+from collections import OrderedDict, deque
+from bisect import bisect_left
+from contextlib import contextmanager
+from timeit import default_timer as best_timer
+from PIL import Image, ImageDraw, ImageFont
+from pypicolcd.glyphcache import GlyphCache, CHARSET, font_has_kerning
+from pypicolcd.lcdprotocol import font_meta
+# from PIL import Image, ImageDraw, ImageFont, ImageColor
+
+try:
+    import usb
+    import usb.core
+    import usb.legacy
+except ImportError:
+    # NOTE: ModuleNotFoundError is only available in Python 3.
+    raise ImportError(
+        'pypicolcd requires pyusb (see "Install" in readme.md)'
+    )
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is optional (see image_to_pages).
+    numpy = None
+
+# TODO: remove about_msg and use pypicolcd.__doc__ (generated from
+# docstring above) instead?
+
+about_msg = """
+pypicolcd  Copyright (C) 2018  Jake Gustafson
+This program comes with ABSOLUTELY NO WARRANTY.
+This is free software, and you are welcome to redistribute it
+under certain conditions; open LICENSE file in text editor for details.
+"""
+
+# See
+# <https://linuxconfig.org/
+# tutorial-on-how-to-write-basic-udev-rules-in-linux>
+# NOTE: double curly brace becomes literal (single):
+dev_permission_msg = """
+{user} must have root access or be given permission to manage
+device id {device_id} (hex {device_hex}) via a udev rule file such as
+/etc/udev/rules.d/50-picoUSB-{device_hex}.rules
+  * containing:
+
+SUBSYSTEM!="usb_device",
+ACTION!="add", GOTO="datalogger_rules_end"
+ATTR{{idVendor}}=="{vendor_hex}", ATTR{{idProduct}}=="{device_hex}", SYMLINK+="datalogger"
+MODE="0666", OWNER="{user}", GROUP="root"
+LABEL="datalogger_rules_end"
+
+  * or for OLDER systems:
+
+SUBSYSTEM !="usb_device",
+ACTION !="add", GOTO="datalogger_rules_end"
+SYSFS{{idVendor}}=="{vendor_hex}", SYSFS{{idProduct}}=="{device_hex}", SYMLINK+="datalogger"
+MODE="0666", OWNER="{user}", GROUP="root"
+LABEL="datalogger_rules_end"
+
+  * debug via:\n"
+    udevadm test /etc/udev/rules.d/50-picoUSB-{device_hex}.rules
+
+* Then reload rules:
+  udevadm control --reload-rules
+  udevadm trigger
+  # Then optionally:
+  udevadm test /etc/udev/rules.d/50-picoUSB-{device_hex}.rules
+
+* Then you must unplug the device!
+
+* However, on some systems, the following may work:
+  sudo usermod -a -G dialout {user}
+  #- You must log out and log in after that.
+
+"""
+
+# The variable below an example provided for maintainers.
+picoLCD_256x64_msg = dev_permission_msg.format(
+    user="?",
+    device_id="?",
+    device_hex="c002",
+    vendor_hex="04d8"
+)
+
+
+class DisconnectedError(Exception):
+    pass
+
+
+def view_traceback(indent=""):
+    ex_type, ex, tb = sys.exc_info()
+    print(indent + str(ex_type) + " " + str(ex) + ": ")
+    traceback.print_tb(tb)
+    del tb
+    print("")
+
+
+def bytes(*b):
+    return "".join([chr(x) for x in b])
+
+
+OUT_REPORT_LED_STATE            = 0x81
+OUT_REPORT_LCD_BACKLIGHT        = 0x91
+OUT_REPORT_LCD_CONTRAST         = 0x92
+OUT_REPORT_LCD_CONTROL          = 0x93
+OUT_REPORT_LCD_CLEAR            = 0x94
+OUT_REPORT_DATA                 = 0x95  # from official 128x64 driver
+OUT_REPORT_CMD_DATA             = 0x96  # from official 128x64 driver
+OUT_REPORT_LCD_TEXT             = 0x98  # only for text models
+OUT_REPORT_LCD_FONT             = 0x9C  # only for text models
+
+_CMD3_HEADER_LEN = 12  # OUT_REPORT_CMD_DATA bytes before the data
+_CMD4_HEADER_LEN = 5  # OUT_REPORT_DATA bytes before the data
+REPORT_NAMES = {}  # the name of each report ID (see get_stats)
+for _name, _value in list(globals().items()):
+    if _name.startswith("OUT_REPORT_"):
+        REPORT_NAMES[_value] = _name
+# The upper bound (inclusive) of each write latency bucket except the
+# last, which counts the rest (see get_stats):
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0,
+                      100.0, 250.0, 1000.0)
+FRAME_HISTORY = 120  # how many recent frames get_stats shows
+
+# Trace levels (see PicoLCD.set_trace), where each level includes the
+# messages of the levels before it:
+TRACE_OFF = 0
+TRACE_INFO = 1  # connecting and reconnecting
+TRACE_DEBUG = 2  # each drawing operation and refresh (verbose_enable)
+TRACE_WRITES = 3  # each write to the device
+
+# Connection states (see PicoLCD.get_connection_state):
+STATE_CONNECTED = "connected"
+STATE_DISCONNECTED = "disconnected"
+STATE_RECONNECTING = "reconnecting"
+
+width = 20
+height = 4  # can also be 2
+ids = [0xc001, 0xc002]
+VENDOR_ID = 0x04d8  # of every known device (see DC_DICT)
+
+DC_DICT = {}  # devices' characteristics dicts
+tmp_dc = {}
+tmp_dc["type"] = "text"
+tmp_dc["name"] = "picoLCD 20x4"
+tmp_dc["width"] = 20
+tmp_dc["height"] = 4  # or 2, but that Product ID is unknown
+tmp_dc["blockrows"] = 1
+tmp_dc["zones"] = 1
+tmp_dc["block_size"] = 80
+# tmp_dc["chip_orientation"] = "landscape"
+DC_DICT[str(0xc001)] = tmp_dc
+tmp_dc = {}
+tmp_dc["type"] = "graphics"
+tmp_dc["name"] = "picoLCD 256x64"
+# tmp_dc["chip_orientation"] = "portrait"
+tmp_dc["ppb"] = 8  # VERTICAL pixels per byte
+tmp_dc["width"] = 256
+tmp_dc["height"] = 64
+tmp_dc["blockrows"] = 8
+tmp_dc["zones"] = 8
+tmp_dc["block_size"] = 32  # ok since 8x8x32 == 256*(64/8) == 2048
+tmp_dc["inverted"] = 1  # 1 as per official driver
+#                         /picoLCDGraphic/Configs/lcd4linux.conf
+tmp_dc["chip_size"] = 64 * (64 / tmp_dc["ppb"])  # 64x64 pixels,
+#                                                  but 1-bit
+tmp_dc["chip_count"] = 4
+DC_DICT[str(0xc002)] = tmp_dc
+tmp_dc = None
+
+
+def find_devices(bus=None, address=None):
+    """
+    Find known devices (see DC_DICT). Unlike usb.busses(), this does not
+    read the configuration of every other USB device.
+
+    Keyword arguments:
+    bus, address -- only find a device at this location (see
+        PicoLCD.connect)
+
+    Returns:
+        a list of pyusb legacy devices (like those from usb.busses())
+    """
+    criteria = {}
+    if bus is not None:
+        criteria["bus"] = bus
+        criteria["address"] = address
+    found = usb.core.find(
+        find_all=True,
+        idVendor=VENDOR_ID,
+        custom_match=lambda dev: str(dev.idProduct) in DC_DICT,
+        **criteria
+    )
+    return [usb.legacy.Device(dev) for dev in found]
+
+
+def get_pixel_color(canvas, x, y):
+    """
+    Try to get the pixel color from a Tkinter canvas.
+
+    This function is useless, since it doesn't work for anything but
+    rects, which we already know are there (This just gets a black
+    rectangle for text)
+    """
+    ids = canvas.find_overlapping(x, y, x, y)
+    if len(ids) > 0:
+        index = ids[-1]  # -1 gets top (last) graphics instruction
+        color = canvas.itemcget(index, "fill")
+        color = color.upper()
+        if color != '':
+            return color.upper()
+    else:
+        print("[ pypicolcd ] WARNING in get_pixel_color: no color"
+              " at " + str((x, y)))
+    return "WHITE"
+
+
+my_path = os.path.abspath(os.path.dirname(__file__))
+
+
+def find_resource(path):
+    ret = None
+    in_module_path = os.path.join(my_path, path)
+    if os.path.isfile(in_module_path):
+        ret = in_module_path
+        # print("FOUND: '{}'".format(ret))
+    elif os.path.isfile(os.path.abspath(path)):
+        ret = os.path.abspath(path)
+        # print("FOUND: '{}'".format(ret))
+    else:
+        print("ERROR: resource is not present here or in"
+              " '{}': '{}'".format(my_path, path))
+    return ret
+
+
+# font_meta (see lcdprotocol) gets the path of each font:
+for name, meta in font_meta.items():
+    font_meta[name]["path"] = find_resource(
+        os.path.join("fonts", meta["filename"])
+    )
+    if font_meta[name]["path"] is None:
+        print("ERROR: missing '{}' (not in '{}')".format(
+            meta["filename"],
+            my_path
+        ))
+
+
+def get_font_meta(name):
+    return font_meta.get(name.lower())
+
+
+def get_default_threshold(font_path, font_size):
+    """
+    Get the threshold that draw_text_at uses for a font if None is
+    specified.
+    """
+    if font_path == font_meta["ninepin"]["path"]:
+        # accommodate edges of blocks in ninepin font
+        if font_size > 8:
+            return .02
+        return .03
+    return .5
+
+
+BLIT_OPS = ["copy", "or", "and", "xor"]
+_bit_tables = None  # see rows_to_pages
+
+
+def rows_to_pages(data, size):
+    """
+    Convert a packed 1-bit bitmap from rows to pages.
+
+    Sequential arguments:
+    data -- rows of pixels from top to bottom, where each row is packed
+        from left to right with the most significant bit first and
+        padded to a whole byte (the format of PIL's tobytes() for a
+        "1" mode image)
+    size -- the (width, height) of the bitmap in pixels
+
+    Returns:
+        a bytearray of pages (rows of 8-pixel-high vertical stripes)
+        from top to bottom, where each page is width bytes and the
+        least significant bit of each byte is the top pixel (the native
+        layout of graphics type devices)
+    """
+    global _bit_tables
+    if _bit_tables is None:
+        # _bit_tables[i] translates a byte to 1 if the pixel i from the
+        # left (bit 7-i) is on, otherwise 0.
+        _bit_tables = []
+        for i in range(8):
+            bit = 1 << (7 - i)
+            _bit_tables.append(bytearray(
+                [1 if (b & bit) else 0 for b in range(256)]
+            ))
+    w, h = size
+    stride = (w + 7) // 8
+    if len(data) < stride * h:
+        raise ValueError("A {}x{} bitmap requires {} bytes but got {}."
+                         "".format(w, h, stride * h, len(data)))
+    data = memoryview(data)
+    pixels = bytearray(stride * 8)  # one row, one byte per pixel
+    pages = bytearray()
+    for top in range(0, h, 8):
+        page = 0
+        for bit_i in range(min(8, h - top)):
+            start = (top + bit_i) * stride
+            row = data[start:start+stride].tobytes()
+            for i in range(8):
+                pixels[i::8] = row.translate(_bit_tables[i])
+            page |= int.from_bytes(pixels, "little") << bit_i
+        pages += page.to_bytes(stride * 8, "little")[:w]
+    return pages
+
+
+def image_to_pages(image, threshold=None, invert_enable=False,
+                   brightness=1.0):
+    """
+    Convert an image to a 1-bit bitmap in the native page layout (see
+    rows_to_pages). If NumPy is installed, the conversion is done using
+    array operations, otherwise each pixel is converted in Python.
+
+    Sequential arguments:
+    image -- a PIL image (converted to "RGB" mode if it is not)
+
+    Keyword arguments:
+    threshold -- the brightness from 0.0 to 1.0 at or above which a
+        pixel is off (shows the backlight). The result is the same with
+        or without NumPy. If None, use random dithering instead.
+    invert_enable -- turn on the pixels that would be off and vice
+        versa
+    brightness -- (only used for dithering) how likely pixels are to be
+        off, where 1.0 is normal
+
+    Returns:
+        a bytearray (or bytes if NumPy was used) of ceil(height/8)
+        pages, each width bytes
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    w, h = image.size
+    brightness *= 2
+    on_table = None
+    if threshold is not None:
+        # on_table[r+g+b] is whether the pixel is on (dark).
+        on_table = bytearray(766)
+        for total in range(766):
+            if (float(total) / 765. >= threshold) == invert_enable:
+                on_table[total] = 1
+    if numpy is not None:
+        totals = numpy.asarray(image, dtype=numpy.uint16).sum(axis=2)
+        if on_table is not None:
+            on = numpy.frombuffer(on_table, dtype=numpy.uint8)[totals]
+        else:
+            ri = numpy.random.randint(0, 765, size=(h, w))
+            on = (totals * brightness < ri) != invert_enable
+        page_count = (h + 7) // 8
+        padded = numpy.zeros((page_count * 8, w), dtype=numpy.uint8)
+        padded[:h] = on
+        return numpy.packbits(padded.reshape(page_count, 8, w), axis=1,
+                              bitorder="little").tobytes()
+    data = image.tobytes()
+    stride = w * 3
+    pixels = bytearray(w)  # one row, one byte per pixel
+    pages = bytearray()
+    for top in range(0, h, 8):
+        page = 0
+        for bit_i in range(min(8, h - top)):
+            start = (top + bit_i) * stride
+            src_x = 0
+            for i in range(start, start + stride, 3):
+                total = data[i] + data[i+1] + data[i+2]
+                if on_table is not None:
+                    pixels[src_x] = on_table[total]
+                else:
+                    ri = random.randrange(765)
+                    # on is dark (blocks backlight)
+                    pixels[src_x] = (total * brightness < ri) != invert_enable
+                src_x += 1
+            page |= int.from_bytes(pixels, "little") << bit_i
+        pages += page.to_bytes(w, "little")
+    return pages
+
+
+def print_trace(level, where, msg):
+    """
+    Show a trace message (the default trace sink, see
+    PicoLCD.set_trace).
+    """
+    print("[ pypicolcd ] (verbose message in {}) {}".format(where, msg))
+
+
+class TraceRing:
+    """
+    A trace sink (see PicoLCD.set_trace) that keeps only the most
+    recent messages in memory, so tracing can stay on without writing
+    to the console (call get_lines when something goes wrong).
+    """
+
+    def __init__(self, size=1000, forward=None):
+        """
+        Keyword arguments:
+        size -- how many messages to keep
+        forward -- also pass each message to this sink (such as
+            print_trace)
+        """
+        self.records = deque(maxlen=size)  # (time, level, where, msg)
+        self.forward = forward
+
+    def __call__(self, level, where, msg):
+        self.records.append((datetime.now(), level, where, msg))
+        if self.forward is not None:
+            self.forward(level, where, msg)
+
+    def get_lines(self):
+        return ["{} [{}] {}: {}".format(
+                    when.strftime("%H:%M:%S.%f"), level, where, msg
+                ) for when, level, where, msg in list(self.records)]
+
+    def clear(self):
+        self.records.clear()
+
+
+class GlyphAtlas:
+    """
+    Keep rendered glyphs (characters) in the native page layout so that
+    drawing the same text again doesn't require rendering it. Each
+    glyph is a dict with the following keys:
+    pages -- the pixels that are on, in the native page layout (see
+        rows_to_pages), cropped to the pixels that are on (so a glyph
+        taller than 8 pixels spans several pages)
+    x, y -- the location of the top left pixel of pages relative to
+        where the glyph is drawn (the top left of the line of text)
+    width, height -- the size of the cropped glyph in pixels
+    advance -- how far (in pixels, possibly fractional) to move right
+        before drawing the next glyph
+    ink -- the (start, stop) x range relative to where the glyph is
+        drawn where any part of the glyph is drawn (even if below the
+        threshold), or None
+
+    Glyphs are forgotten starting with the least recently used whenever
+    the total size exceeds max_bytes. If disk_cache is a GlyphCache (see
+    pypicolcd.glyphcache), glyphs of the characters in CHARSET are
+    loaded from (or rendered once and saved to) glyph table files, so
+    that the font file is only loaded for other characters.
+    """
+    GLYPH_OVERHEAD = 64  # roughly the bytes used by a glyph besides pages
+
+    def __init__(self, max_bytes=262144, disk_cache=None):
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fonts = {}  # ImageFont objects: fonts[font_path][str(size)]
+        self._glyphs = OrderedDict()
+        self._tables = {}  # threshold lookup tables for Image.point
+
+    def get_font(self, font_path, font_size):
+        """
+        Get the ImageFont for the font file at the size in points,
+        loading it if it is not loaded yet.
+        """
+        fss = str(font_size)
+        sizes = self.fonts.get(font_path)
+        if sizes is None:
+            sizes = {}
+            self.fonts[font_path] = sizes
+        fnt = sizes.get(fss)
+        if fnt is None:
+            fnt = ImageFont.truetype(font_path, font_size)
+            sizes[fss] = fnt
+        return fnt
+
+    def get_threshold_table(self, threshold):
+        """
+        Get a table for Image.point that makes an "L" image into a "1"
+        image where each value that is at least threshold (0.0 to 1.0)
+        of 255 is on.
+        """
+        table = self._tables.get(threshold)
+        if table is None:
+            table = [255 if (float(a) / 255. >= threshold) else 0
+                     for a in range(256)]
+            self._tables[threshold] = table
+        return table
+
+    def get(self, font_path, font_size, threshold, c):
+        """
+        Get the glyph dict (see GlyphAtlas) for the character c,
+        rendering it if it is not cached.
+
+        Sequential arguments:
+        threshold -- a pixel is on if its opacity is this or higher
+        """
+        key = (font_path, font_size, threshold, c)
+        glyph = self._glyphs.get(key)
+        if glyph is not None:
+            self.hits += 1
+            self._glyphs.move_to_end(key)
+            return glyph
+        self.misses += 1
+        glyph = None
+        table = self._get_table(font_path, font_size, threshold)
+        if table is not None:
+            glyph = table.get(c)
+        if glyph is None:
+            glyph = self._render(self.get_font(font_path, font_size),
+                                 threshold, c)
+        self._store(key, glyph, len(glyph["pages"]))
+        return glyph
+
+    def get_kerning(self, font_path, font_size, pair, threshold=None):
+        """
+        Get how much farther (in pixels) the second character of pair
+        is from the first than the advance of the first.
+
+        Keyword arguments:
+        threshold -- if not None, try to get the kerning from the glyph
+            table for this threshold first (see GlyphAtlas)
+        """
+        key = (font_path, font_size, None, pair)
+        kerning = self._glyphs.get(key)
+        if kerning is not None:
+            self._glyphs.move_to_end(key)
+            return kerning
+        if threshold is not None:
+            table = self._get_table(font_path, font_size, threshold)
+            if table is not None:
+                kerning = table.get_kerning(pair)
+                if kerning is not None:
+                    self._store(key, kerning, 0)
+                    return kerning
+        fnt = self.get_font(font_path, font_size)
+        kerning = (fnt.getlength(pair) - fnt.getlength(pair[0])
+                   - fnt.getlength(pair[1]))
+        self._store(key, kerning, 0)
+        return kerning
+
+    def layout(self, font_path, font_size, threshold, text):
+        """
+        Get the glyphs for a line of text and where to draw them.
+
+        Returns:
+            a list of (x, glyph) tuples where x is relative to the
+            start of the line, or None if the partially transparent
+            edges of any glyphs overlap (since the text would then look
+            different than if the whole line were rendered at once)
+        """
+        results = []
+        pen = 0.0
+        ink_stop = None
+        prev_c = None
+        for c in text:
+            if prev_c is not None:
+                pen += self.get_kerning(font_path, font_size, prev_c + c,
+                                        threshold=threshold)
+            glyph = self.get(font_path, font_size, threshold, c)
+            # Round the same way as FreeType's PIXEL macro:
+            x = int(pen + .5)
+            ink = glyph["ink"]
+            if ink is not None:
+                if (ink_stop is not None) and (x + ink[0] < ink_stop):
+                    return None
+                ink_stop = x + ink[1]
+            results.append((x, glyph))
+            pen += glyph["advance"]
+            prev_c = c
+        return results
+
+    def build_table(self, font_path, font_size, threshold):
+        """
+        Render the glyphs of the characters in CHARSET and find the
+        kerning of each pair of them.
+
+        Returns:
+            a tuple of glyphs and kerning (see glyphcache.write_table)
+        """
+        fnt = self.get_font(font_path, font_size)
+        glyphs = {}
+        for c in CHARSET:
+            glyphs[c] = self._render(fnt, threshold, c)
+        kerning = {}
+        if font_has_kerning(font_path):
+            for first in CHARSET:
+                for second in CHARSET:
+                    value = (fnt.getlength(first + second)
+                             - glyphs[first]["advance"]
+                             - glyphs[second]["advance"])
+                    if value != 0:
+                        kerning[first + second] = value
+        return glyphs, kerning
+
+    def _get_table(self, font_path, font_size, threshold):
+        if self.disk_cache is None:
+            return None
+        return self.disk_cache.get_table(
+            font_path, font_size, threshold,
+            build=lambda: self.build_table(font_path, font_size, threshold)
+        )
+
+    def clear(self):
+        """
+        Forget all glyphs (but not fonts).
+        """
+        self._glyphs.clear()
+        self.used_bytes = 0
+
+    def _store(self, key, value, size):
+        self._glyphs[key] = value
+        self.used_bytes += size + GlyphAtlas.GLYPH_OVERHEAD
+        while (self.used_bytes > self.max_bytes) and (len(self._glyphs) > 1):
+            old_key, old_value = self._glyphs.popitem(last=False)
+            self.used_bytes -= GlyphAtlas.GLYPH_OVERHEAD
+            if isinstance(old_value, dict):
+                self.used_bytes -= len(old_value["pages"])
+            self.evictions += 1
+
+    def _render(self, fnt, threshold, c):
+        glyph = {
+            "pages": b"",
+            "x": 0,
+            "y": 0,
+            "width": 0,
+            "height": 0,
+            "advance": fnt.getlength(c),
+            "ink": None,
+        }
+        left, top, right, bottom = fnt.getbbox(c)
+        if (right <= left) or (bottom <= top):
+            return glyph
+        mask = Image.new('L', (right - left, bottom - top), 0)
+        ImageDraw.Draw(mask).text((-left, -top), c, font=fnt, fill=255)
+        ink = mask.getbbox()
+        if ink is None:
+            return glyph
+        glyph["ink"] = (left + ink[0], left + ink[2])
+        bits = mask.point(self.get_threshold_table(threshold), '1')
+        bbox = bits.getbbox()
+        if bbox is None:
+            return glyph
+        bits = bits.crop(bbox)
+        glyph["x"] = left + bbox[0]
+        glyph["y"] = top + bbox[1]
+        glyph["width"], glyph["height"] = bits.size
+        glyph["pages"] = rows_to_pages(bits.tobytes(), bits.size)
+        return glyph
+
+
+class OffscreenBuffer:
+    """
+    A buffer in the layout of PicoLCD.framebuffer (see
+    reset_framebuffer) that PicoLCD can draw to instead of the
+    framebuffer (see PicoLCD.draw_to), such as a back buffer that is
+    copied to the framebuffer later. It has no device, so drawing to it
+    never writes to USB.
+    """
+
+    def __init__(self, dc):
+        """
+        Sequential arguments:
+        dc -- the device characteristics (see DC_DICT) of the PicoLCD
+            that will draw to it
+        """
+        self.dc = dc
+        self.data = bytearray(dc["blockrows"] * dc["zones"]
+                              * dc["block_size"])
+        self.push_pos = (0, 0)  # where push_text continues
+
+    def get_width(self):
+        return self.dc["width"]
+
+    def get_height(self):
+        return self.dc["height"]
+
+    def clear(self):
+        self.data[:] = bytes(len(self.data))
+
+
+class PicoLCD:
+
+    def __init__(self, verbose_enable=False, async_enable=False,
+                 device=None):
+        """
+        Connect to the first known device (see connect).
+
+        Keyword arguments:
+        verbose_enable -- show debugging messages (see set_trace)
+        async_enable -- write in a background thread (see
+            set_async_enable)
+        device -- use this device instead of searching the USB buses,
+            such as a pypicolcd.simulator.SimulatedDevice
+        """
+        self.device = device
+        self._device_location = None  # (bus, address), see connect
+        self.dc = None  # device characteristics (see DC_DICT)
+        self.handle = None
+        self.error = None
+        self._connected = False  # see ready and get_connection_state
+        # Only one reconnect runs at a time (see reconnect):
+        self._reconnect_lock = threading.Lock()
+        self._reconnect_failures = 0  # since the last disconnect
+        self._next_reconnect = 0.0  # see get_reconnect_delay
+        # Automatic reconnect attempts (see try_reconnect) wait
+        # min_delay*2**(failures-1) seconds, up to max_delay:
+        self.reconnect_min_delay = .5
+        self.reconnect_max_delay = 30.0
+        self.auto_reconnect_enable = True
+        self.enable_permission_msg = True  # Only show this once.
+        self._backlight_level = 0xFF
+        self.framebuffer = None  # see reset_framebuffer
+        self.framebuffers = None  # a memoryview of each block
+        self._fb_view = None
+        self._zeros = None
+        self._ones = None
+        self._shadow = None  # what the device shows (see refresh_block)
+        self._shadow_known = None  # 1 for each _shadow byte known
+        self._pitch = None  # bytes per row of blocks
+        self.change_enables = None  # exclusive stop x of each block
+        self.change_starts = None  # start x of each block
+        self.blocks_sent = 0  # during the last refresh
+        self.blocks_skipped = 0  # during the last refresh
+        self.bytes_sent = 0  # during the last refresh
+        self.bytes_saved = 0  # by planning the last refresh
+        # The lock is held while the changed parts of blocks are marked
+        # or taken for writing (see _refresh_dirty):
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        # Held for each write, and across a sequence of writes that
+        # relies on the previous one (see _write_chip_page), so that a
+        # report from another thread (such as set_backlight while the
+        # writer thread writes) can't land in between:
+        self._usb_lock = threading.RLock()
+        self.async_enable = False  # see set_async_enable
+        self._writer = None
+        self._writer_stop = False
+        self._writing = False
+        self._refresh_requested = False
+        self._frame_depth = 0  # how many frames are open (see frame)
+        self._min_frame_interval = 0.0  # see set_max_fps
+        self._frame_timer = None
+        self._stats_lock = threading.Lock()
+        self._stats = None
+        self.reset_stats()
+        self.trace_level = TRACE_OFF  # see set_trace
+        self.trace_sink = print_trace
+        self.verbose_enable = verbose_enable
+        self.default_font = "ninepin"
+        df = self.default_font
+        self.enable_no_device_error = True
+        self.default_font_size = font_meta[df]["default_size"]
+        self._pos = (0, 0)
+        self.glyph_atlas = GlyphAtlas(disk_cache=GlyphCache())
+        self._f_cache = self.glyph_atlas.fonts  # font cache
+        self._text_draw = None  # for measuring text (see draw_text_at)
+        # self.default_font_path = "fonts/ninepin.ttf"
+        self.invalidate_dt = datetime.now()
+        self.connect()
+        self.preview_flag = False
+        self._fps_interval = .4
+        self._average_fps = None
+        self._fps_last_frame_tick = None
+        self._actual_frame_interval = None
+        self._last_update_s = None
+        self._fps_accumulated_time = 0.
+        self._fps_accumulated_count = 0
+        if async_enable:
+            self.set_async_enable(True)
+
+    @staticmethod
+    def get_font_names():
+        return font_meta.keys()
+
+    def connect(self, silent=False, enable_reset=True):
+        """
+        Connect to the first known device (see DC_DICT), or to the
+        device passed to the constructor.
+
+        The device characteristics (dc) and the framebuffer are kept
+        if connecting fails, so that drawing can continue in the
+        framebuffer (see get_connection_state).
+
+        Keyword arguments:
+        silent -- do not show why connecting failed
+        enable_reset -- erase the framebuffer and the display (if
+            False, only erase the framebuffer if its size changed)
+
+        Returns:
+            True if connected (see ready)
+        """
+        self._connected = False
+        self.error = None
+        dc = None
+        handle = None
+        if self.device is not None:
+            devices = [self.device]
+        else:
+            devices = []
+            if self._device_location is not None:
+                # It is usually still there after a glitch:
+                self.blab("* Looking for the device at {}",
+                          self._device_location, level=TRACE_INFO)
+                devices = find_devices(*self._device_location)
+            if not devices:
+                self.blab("* Searching USB buses...", level=TRACE_INFO)
+                devices = find_devices()
+        this_idVendor = None
+        this_idProduct = None
+        this_device = None
+        found_count = 0
+        for device in devices:
+            if device.idVendor == VENDOR_ID and \
+                    str(device.idProduct) in DC_DICT.keys():
+                #    device.idProduct in ids:
+                this_device = device
+                dc = DC_DICT[str(device.idProduct)]
+                this_idVendor = device.idVendor
+                this_idProduct = device.idProduct
+                self.blab("  * found {}", dc["name"], level=TRACE_INFO)
+                found_count += 1
+
+        if this_device is not None:
+            try:
+                handle = this_device.open()
+            except usb.core.USBError as e:
+                # It was disconnected after the search.
+                dc = None
+                self.error = ("ERROR: pypicolcd could not open the"
+                              " device: {}".format(e))
+        if handle is not None:
+            try:
+                handle.detachKernelDriver(0)
+            except usb.USBError:
+                # print("[ PicoLCD ] nothing to detach")
+                pass
+            try:
+                handle.claimInterface(0)
+                handle.setAltInterface(0)
+                # print("[ pypicolcd ] claimed interface 0")
+            except usb.core.USBError:
+                dc = None
+                # 50 is a priority level where lower numbers are first
+                # (small x for lowercase--which is udev rule format):
+                idv_s = '{:04x}'.format(this_idVendor)  # 4 hex digits
+                idp_s = '{:04x}'.format(this_idProduct)  # 4 hex digits
+                idp_i_s = str(this_idProduct)
+                un = "yourusername"
+                try:
+                    import getpass
+                    un = getpass.getuser()
+                except Exception:
+                    pass
+
+                self.error = "  Claiming the interface failed. "
+                if un == "root":
+                    self.error += ("\n  You are root, so this shouldn't"
+                                   " happen.")
+                elif self.enable_permission_msg:
+                    self.error = dev_permission_msg.format(
+                        user=un,
+                        device_id=idp_i_s,
+                        device_hex=idp_s,
+                        vendor_hex=idv_s
+                    )
+                    self.enable_permission_msg = False
+                self.error += ("\n\n")
+                self.error += ("* Connecting to a root hub or USB 2 or"
+                               "\n  earlier port may solve the issue if"
+                               "\n  " + un + " already has the correct"
+                               " permissions to the device.")
+
+                # print("[ PicoLCD ] ERROR--" + self.error + ": ")
+                # NOTE: self.error is shown further down.
+                # view_traceback()
+        else:
+            if self.error is None:
+                self.error = ("ERROR: pypicolcd did not find a"
+                              " known product ID connected to USB.")
+        if dc is not None:
+            self.dc = dc
+            block_count = self.dc["blockrows"] * self.dc["zones"]
+            if (self.change_enables is None) or \
+                    (len(self.change_enables) != block_count):
+                self.change_enables = [0] * block_count
+                self.change_starts = [0] * block_count
+            # else keep blocks that were not written yet dirty.
+            if self.dc["type"] == "graphics":
+                # block_count = self.dc["blockrows"] * self.dc["zones"]
+                # self.framebuffers = []
+                # for fb_i in range(block_count):
+                #     self.framebuffer = [0] * (self.dc["block_size"])
+                #     self.framebuffer[1] = 255
+                #     if self.framebuffer[0] == 255:
+                #         # deal with list initialization paranoia
+                #         print("[ pycolcd ] ERROR: failed to create"
+                #               " unique framebuffer elements")
+                #         sys.exit(1)
+                #     else:
+                #         self.framebuffer[1] = 0
+                #         self.framebuffers.append(self.framebuffer)
+                pass
+            else:
+                # self.framebuffers = []
+                # self.framebuffer = [0] * (self.dc["block_size"])
+                # self.framebuffers.append(self.framebuffer)
+                pass
+            size = block_count * self.dc["block_size"]
+            if enable_reset or (self.framebuffer is None) or \
+                    (len(self.framebuffer) != size):
+                self.reset_framebuffer(enable_reconnect=False)
+            self.handle = handle
+            self._connected = True
+        else:
+            self.handle = None
+        if self.error is not None:
+            if (not silent) and self.enable_no_device_error:
+                self.blab("* pypicolcd found {} known device(s)",
+                          found_count, level=TRACE_INFO)
+                print(self.error)
+                self.enable_no_device_error = False
+        if self.ready():
+            self.enable_no_device_error = True
+            dev = getattr(this_device, "dev", None)  # if not simulated
+            if dev is not None:
+                self._device_location = (dev.bus, dev.address)
+            # The device may have been reset or changed while
+            # disconnected:
+            self.forget_device_state()
+            if enable_reset:
+                self.clear()
+            self.set_backlight(self._backlight_level,
+                               enable_reconnect=False)
+        return self.ready()
+
+    @property
+    def verbose_enable(self):
+        return self.trace_level >= TRACE_DEBUG
+
+    @verbose_enable.setter
+    def verbose_enable(self, enable):
+        if enable:
+            if self.trace_level < TRACE_DEBUG:
+                self.trace_level = TRACE_DEBUG
+        elif self.trace_level > TRACE_INFO:
+            self.trace_level = TRACE_OFF
+
+    def set_trace(self, level, sink=None):
+        """
+        Set which trace messages are shown (or sent to the sink).
+
+        Sequential arguments:
+        level -- TRACE_OFF, TRACE_INFO, TRACE_DEBUG (the same as
+            verbose_enable) or TRACE_WRITES
+
+        Keyword arguments:
+        sink -- a function that accepts (level, where, msg), such as a
+            TraceRing (if None, keep the current sink, which is
+            print_trace by default)
+        """
+        if sink is not None:
+            self.trace_sink = sink
+        self.trace_level = level
+
+    def blab(self, msg, *args, where=None, level=TRACE_DEBUG):
+        """
+        Trace a message if level is enabled (see set_trace). The message
+        is only formatted (msg.format(*args)) if it is shown, so pass
+        the values as args instead of formatting them. Code that runs
+        often should check trace_level first, so that nothing is called
+        at all when tracing is off.
+
+        Keyword arguments:
+        where -- the name of the caller (if None, use the name of the
+            function that called blab)
+        """
+        if self.trace_level < level:
+            return
+        if args:
+            msg = msg.format(*args)
+        if where is None:
+            # One frame (not a walk of the stack, which is slow):
+            where = sys._getframe(1).f_code.co_name
+        self.trace_sink(level, where, msg)
+
+    def get_width(self):
+        return self.dc["width"]
+
+    def get_height(self):
+        return self.dc["height"]
+
+    def generate_fps(self):
+        result = None
+        # if self._last_update_s is not None:
+        #     got_frame_delay = best_timer() - self._last_update_s
+        self._last_update_s = best_timer()
+        if self._fps_last_frame_tick is not None:
+            # NOTE: best_timer() is in seconds
+            self._actual_frame_interval = \
+                best_timer() - self._fps_last_frame_tick
+            self._fps_accumulated_time += self._actual_frame_interval
+            self._fps_accumulated_count += 1
+            if self._fps_accumulated_time >= self._fps_interval:
+                self._average_fps = (
+                    1.0
+                    / (self._fps_accumulated_time
+                       / float(self._fps_accumulated_count))
+                )
+                self._fps_accumulated_time = 0.0
+                self._fps_accumulated_count = 0
+                result = self._average_fps
+            # if self._actual_frame_interval > 0.0:
+            #     actual_fps = 1.0 / self._actual_frame_interval
+        self._fps_last_frame_tick = best_timer()
+        return result
+
+    def set_fps_interval(self, seconds):
+        self._fps_interval = seconds
+
+    def get_fps(self):
+        return self._average_fps
+
+    @contextmanager
+    def frame(self):
+        """
+        Draw a frame: Refreshes (including the refresh that drawing
+        methods do by default) are deferred until the end of the
+        outermost frame, then everything drawn during the frame is
+        written at once. For example:
+
+            with picolcd.frame():
+                picolcd.draw_rect(rect, False)
+                picolcd.draw_text_at(pos, "ok")
+
+        If the code in the frame raises an exception, the frame is not
+        written (but stays invalidated, so the next refresh writes it).
+
+        Each frame counts toward get_fps (see generate_fps), and if
+        set_max_fps is on, the frame is written at the next time the
+        frame rate allows.
+        """
+        with self._lock:
+            self._frame_depth += 1
+        completed = False
+        try:
+            yield self
+            completed = True
+        finally:
+            # (Even for KeyboardInterrupt or GeneratorExit, so that
+            # refresh doesn't stay deferred forever.)
+            with self._lock:
+                self._frame_depth -= 1
+        if not completed:
+            return
+        with self._lock:
+            if self._frame_depth > 0:
+                return
+            if self._min_frame_interval <= 0:
+                # Otherwise refresh counts the frame when it is written.
+                self.generate_fps()
+        self.refresh()
+
+    @contextmanager
+    def draw_to(self, buffer):
+        """
+        Draw to an OffscreenBuffer instead of the framebuffer until the
+        with block ends. For example:
+
+            with picolcd.draw_to(buffer):
+                picolcd.draw_text_at(pos, "ok", refresh_enable=False)
+
+        Nothing is invalidated or written meanwhile (refreshes are
+        deferred as in a frame, so the framebuffer is written by the
+        next refresh after the block), and the lock is held so that the
+        writer thread never sees the buffer. Other threads must not
+        draw during the block.
+        """
+        self._require_dc()
+        size = len(buffer.data)
+        block_size = self.dc["block_size"]
+        with self._lock:
+            if size != len(self.framebuffer):
+                raise ValueError("The buffer is {} bytes but the"
+                                 " framebuffer is {}."
+                                 "".format(size, len(self.framebuffer)))
+            saved = (self.framebuffer, self._fb_view, self.framebuffers,
+                     self.change_enables, self.change_starts, self._pos,
+                     self.invalidate_dt)
+            view = memoryview(buffer.data)
+            self.framebuffer = buffer.data
+            self._fb_view = view
+            self.framebuffers = [view[start:start+block_size]
+                                 for start in range(0, size, block_size)]
+            self.change_enables = [0] * len(self.framebuffers)
+            self.change_starts = [0] * len(self.framebuffers)
+            self._pos = buffer.push_pos
+            self._frame_depth += 1
+            try:
+                yield self
+            finally:
+                self._frame_depth -= 1
+                buffer.push_pos = self._pos
+                (self.framebuffer, self._fb_view, self.framebuffers,
+                 self.change_enables, self.change_starts, self._pos,
+                 self.invalidate_dt) = saved
+
+    def set_max_fps(self, fps):
+        """
+        Limit how often refresh writes to the device. A refresh that
+        comes sooner than 1/fps seconds after the previous frame is
+        deferred until then, and every change made in the meantime is
+        written together, so bursts of drawing cause steady, bounded USB
+        traffic instead of a write per drawing call. The time of the
+        previous frame and the rate reported by get_fps come from
+        generate_fps, which is called for each frame written.
+
+        Sequential arguments:
+        fps -- the maximum frames per second (None or 0 to write on
+            every refresh, which is the default)
+        """
+        with self._lock:
+            if fps:
+                self._min_frame_interval = 1.0 / fps
+                return
+            self._min_frame_interval = 0.0
+            pending = self._cancel_frame_timer()
+        if pending:
+            self.refresh()
+
+    def _get_frame_delay(self):
+        """
+        Get how many seconds remain until the frame rate allows another
+        frame (see set_max_fps).
+        """
+        if self._fps_last_frame_tick is None:
+            return 0.0
+        return (self._min_frame_interval
+                - (best_timer() - self._fps_last_frame_tick))
+
+    def _cancel_frame_timer(self):
+        """
+        Cancel the deferred frame (see set_max_fps).
+
+        Returns:
+            True if a frame was deferred, otherwise False
+        """
+        if self._frame_timer is None:
+            return False
+        self._frame_timer.cancel()
+        self._frame_timer = None
+        return True
+
+    def _on_frame_timer(self):
+        with self._lock:
+            self._frame_timer = None
+        try:
+            self.refresh()
+        except Exception as e:
+            print("[ PicoLCD ] ERROR writing a deferred frame: {}"
+                  "".format(e))
+
+    def _refresh_is_deferred(self):
+        """
+        Check whether refresh writes later instead of immediately (see
+        frame, set_max_fps and set_async_enable).
+        """
+        return (self.async_enable or (self._frame_depth > 0)
+                or (self._min_frame_interval > 0))
+
+    def draw_rect(self, rect, on, filled=True, refresh_enable=True):
+        """
+        Draw an exclusive rectangle to the (framebuffer and) LCD.
+
+        Keyword arguments:
+        rect -- tuple of tuples in format ((min_x, min_y),
+            (max_x+1,max_y+1))
+        on -- whether to turn the lcd pixel on (on is dark, since
+            off lets backlight show through)
+        refresh_enable -- whether to write the invalidated area from the
+            framebuffer to the device (if False, call refresh later)
+        """
+        start_x, start_y = rect[0]
+        end_x, end_y = rect[1]
+        if filled:
+            self._fill((start_x, start_y), (end_x, end_y), on)
+        else:
+            # top, bottom, left, right:
+            self._fill((start_x, start_y), (end_x, start_y + 1), on)
+            self._fill((start_x, end_y - 1), (end_x, end_y), on)
+            self._fill((start_x, start_y), (start_x + 1, end_y), on)
+            self._fill((end_x - 1, start_y), (end_x, end_y), on)
+        if refresh_enable:
+            self.refresh()
+
+    def _fill(self, start, end, on):
+        w = end[0] - start[0]
+        h = end[1] - start[1]
+        if (w < 1) or (h < 1):
+            return
+        data = bytearray(w * ((h + 7) // 8))
+        if on:
+            data[:] = b"\xff" * len(data)
+        self.blit(start, data, (w, h), layout="pages",
+                  refresh_enable=False)
+
+    def blit(self, pos, data, size, op="copy", layout="rows",
+             refresh_enable=True):
+        """
+        Draw a 1-bit bitmap to the (framebuffer and) LCD, a whole
+        framebuffer byte (8 vertical pixels) at a time instead of one
+        pixel at a time.
+
+        Sequential arguments:
+        pos -- the (x, y) location for the top left corner of the
+            bitmap (any part beyond the edges of the display is
+            ignored)
+        data -- the packed 1-bit bitmap (bytes, bytearray, or
+            memoryview) where 1 is on (dark)
+        size -- the (width, height) of the bitmap in pixels
+
+        Keyword arguments:
+        op -- how to combine each pixel of the bitmap with the
+            framebuffer: "copy", "or", "and", or "xor" (see BLIT_OPS)
+        layout -- the layout of data: "rows" (see rows_to_pages) or
+            "pages" (the native layout: ceil(height/8) rows of width
+            bytes, where the least significant bit of each byte is the
+            top pixel of the 8-pixel-high vertical stripe)
+        refresh_enable -- whether to write the invalidated area from the
+            framebuffer to the device (if False, call refresh later)
+
+        Returns:
+            the part of the display that the bitmap covers, in
+            ((min_x, min_y), (max_x+1, max_y+1)) format, or None if it
+            is entirely beyond the edges of the display
+        """
+        if op not in BLIT_OPS:
+            raise ValueError("op must be one of: {}".format(BLIT_OPS))
+        self._require_dc()
+        w, h = size
+        if layout == "rows":
+            data = rows_to_pages(data, size)
+        elif layout != "pages":
+            raise ValueError("layout must be \"rows\" or \"pages\"")
+        elif len(data) < w * ((h + 7) // 8):
+            raise ValueError("A {}x{} bitmap requires {} bytes but got {}"
+                             ".".format(w, h, w * ((h + 7) // 8),
+                                        len(data)))
+        x, y = pos
+        dst_w = self.dc["width"]
+        dst_h = self.dc["height"]
+        ppb = self.dc["ppb"]
+        min_x = max(x, 0)
+        end_x = min(x + w, dst_w)
+        min_y = max(y, 0)
+        end_y = min(y + h, dst_h)
+        if (min_x >= end_x) or (min_y >= end_y):
+            return None
+        n = end_x - min_x
+        src_x = min_x - x
+        data = memoryview(data)
+        ones = int.from_bytes(b"\x01" * n, "little")  # 1 in each byte
+        page_q, shift = divmod(y, ppb)
+        lo_mask = ((0xFF << shift) & 0xFF) * ones
+        hi_mask = (0xFF >> (ppb - shift)) * ones
+        page_count = dst_h // ppb
+        for src_page in range(min((end_y - y + ppb - 1) // ppb,
+                                  (h + ppb - 1) // ppb)):
+            dst_page = page_q + src_page
+            if dst_page + 1 < 0:
+                continue
+            rows = h - src_page * ppb
+            mask = 0xFF
+            if rows < ppb:
+                mask = (1 << rows) - 1
+            mask *= ones
+            start = src_page * w + src_x
+            value = int.from_bytes(data[start:start+n], "little") & mask
+            if 0 <= dst_page < page_count:
+                self._blit_page(dst_page, min_x, n, (value << shift) & lo_mask,
+                                (mask << shift) & lo_mask, op)
+            if (shift > 0) and (0 <= dst_page + 1 < page_count):
+                self._blit_page(dst_page + 1, min_x, n,
+                                (value >> (ppb - shift)) & hi_mask,
+                                (mask >> (ppb - shift)) & hi_mask, op)
+        if refresh_enable:
+            self.refresh()
+        return ((min_x, min_y), (end_x, end_y))
+
+    def _blit_page(self, page, x, n, value, mask, op):
+        """
+        Combine n bytes (as a little-endian int) with the framebuffer
+        at page (row of blocks) and x, then invalidate the part that
+        changed.
+
+        Sequential arguments:
+        value -- the pixels (bits outside of the mask must be 0)
+        mask -- the bits of the framebuffer that the bitmap covers
+        """
+        if mask == 0:
+            return
+        start = page * self._pitch + x
+        prev = int.from_bytes(self._fb_view[start:start+n], "little")
+        if op == "copy":
+            result = (prev & ~mask) | value
+        elif op == "or":
+            result = prev | value
+        elif op == "and":
+            result = prev & (value | ~mask)
+        else:
+            result = prev ^ value
+        diff = result ^ prev
+        if diff == 0:
+            return
+        self.framebuffer[start:start+n] = result.to_bytes(n, "little")
+        first = ((diff & -diff).bit_length() - 1) // 8
+        last = (diff.bit_length() - 1) // 8
+        self._invalidate_x(page, x + first, x + last + 1)
+
+    def _invalidate_x(self, block_i, start_x, stop_x):
+        """
+        Mark part of a row of blocks as changed (from start_x to the
+        exclusive stop_x, which are locations on the display).
+        """
+        bs = self.dc["block_size"]
+        zones = self.dc["zones"]
+        for zone_i in range(start_x // bs, (stop_x - 1) // bs + 1):
+            zone_x = zone_i * bs
+            self._invalidate_block(block_i * zones + zone_i,
+                                   max(start_x - zone_x, 0),
+                                   min(stop_x - zone_x, bs))
+
+    def wr(self, m, enable_reconnect=True):
+        """
+        Write bytes directly to the LCD (requires an opcode byte and the
+        number of bytes that the opcode expects).
+
+        While disconnected (see get_connection_state), this returns 0
+        without waiting for a USB timeout. If enable_reconnect, it
+        instead tries to reconnect (see try_reconnect) and raises
+        DisconnectedError if that is not possible yet.
+
+        Returns:
+            bytes written
+        """
+        for attempt in range(2):
+            if not self._connected:
+                if not (enable_reconnect and self._auto_reconnect()):
+                    break
+            handle = self.handle
+            try:
+                with self._usb_lock:
+                    return self._timed_write(m, handle)
+            except (usb.core.USBError, AttributeError) as e:
+                # AttributeError: 'NoneType' object has no attribute
+                # 'interruptWrite'
+                self._set_disconnected(handle, e)
+        if enable_reconnect:
+            raise DisconnectedError("The device is not connected.")
+        return 0
+
+    def _timed_write(self, m, handle):
+        """
+        Write a report and count it (see get_stats).
+        """
+        start = best_timer()
+        try:
+            result = handle.interruptWrite(usb.ENDPOINT_OUT + 1, m, 1000)
+        except usb.core.USBError:
+            with self._stats_lock:
+                self._stats["write_errors"] += 1
+            raise
+        seconds = best_timer() - start
+        stats = self._stats
+        with self._stats_lock:
+            stats["transfers"] += 1
+            stats["bytes"] += result
+            stats["usb_seconds"] += seconds
+            if seconds > stats["write_max_seconds"]:
+                stats["write_max_seconds"] = seconds
+            stats["write_latency_counts"][
+                bisect_left(LATENCY_BUCKETS_MS, seconds * 1000.0)
+            ] += 1
+            report = stats["reports"].get(m[0])
+            if report is None:
+                report = [0, 0]
+                stats["reports"][m[0]] = report
+            report[0] += 1
+            report[1] += result
+        return result
+
+    def get_stats(self):
+        """
+        Get counters of what was written to the device since the
+        PicoLCD was created (or reset_stats was called). Counting is
+        cheap enough to leave on.
+
+        If frame_write_ms (how long each refresh took) is mostly
+        frame_usb_ms (how much of that was spent in USB transfers), and
+        frames are written about as often as frame_write_ms (see
+        frame_interval_ms), the display is limited by USB. If the
+        interval between frames is much longer than the time to write
+        them, the drawing code is the limit.
+
+        Returns:
+            a dict where:
+            transfers, bytes -- successful writes and their size
+            write_errors -- writes that failed
+            reports -- the "transfers" and "bytes" of each report (by
+                name, such as OUT_REPORT_CMD_DATA)
+            write_latency_ms -- "buckets" (the upper bound of each
+                count except the last, see LATENCY_BUCKETS_MS),
+                "counts", "max" and "total"
+            reconnects, reconnect_failures -- successful and failed
+                reconnects
+            reconnect_seconds -- the time spent reconnecting
+            disconnects -- how many times a write failed while
+                connected (see get_connection_state)
+            state -- the connection state (see get_connection_state)
+            blocks_sent, blocks_skipped, bytes_saved -- totals of the
+                attributes of the same names (see refresh)
+            frames -- refreshes that had invalidated blocks
+            frame_interval_ms, frame_write_ms, frame_usb_ms -- the
+                time since the previous frame, the time to write the
+                frame and the time spent in USB transfers, for each of
+                the last FRAME_HISTORY frames
+            fps -- the average frames per second (see get_fps)
+        """
+        with self._stats_lock:
+            stats = self._stats
+            reports = {}
+            for report_id, counts in stats["reports"].items():
+                name = REPORT_NAMES.get(report_id,
+                                        "0x{:02x}".format(report_id))
+                reports[name] = {"transfers": counts[0],
+                                 "bytes": counts[1]}
+            return {
+                "transfers": stats["transfers"],
+                "bytes": stats["bytes"],
+                "write_errors": stats["write_errors"],
+                "reports": reports,
+                "write_latency_ms": {
+                    "buckets": list(LATENCY_BUCKETS_MS),
+                    "counts": list(stats["write_latency_counts"]),
+                    "max": stats["write_max_seconds"] * 1000.0,
+                    "total": stats["usb_seconds"] * 1000.0,
+                },
+                "reconnects": stats["reconnects"],
+                "reconnect_failures": stats["reconnect_failures"],
+                "reconnect_seconds": stats["reconnect_seconds"],
+                "disconnects": stats["disconnects"],
+                "state": self.get_connection_state(),
+                "blocks_sent": stats["blocks_sent"],
+                "blocks_skipped": stats["blocks_skipped"],
+                "bytes_saved": stats["bytes_saved"],
+                "frames": stats["frames"],
+                "frame_interval_ms": list(stats["frame_interval_ms"]),
+                "frame_write_ms": list(stats["frame_write_ms"]),
+                "frame_usb_ms": list(stats["frame_usb_ms"]),
+                "fps": self._average_fps,
+            }
+
+    def reset_stats(self):
+        """
+        Set all counters (see get_stats) to zero.
+        """
+        with self._stats_lock:
+            self._stats = {
+                "transfers": 0,
+                "bytes": 0,
+                "write_errors": 0,
+                "reports": {},  # report ID: [transfers, bytes]
+                "usb_seconds": 0.0,
+                "write_max_seconds": 0.0,
+                "write_latency_counts": [0] * (len(LATENCY_BUCKETS_MS)
+                                               + 1),
+                "reconnects": 0,
+                "reconnect_failures": 0,
+                "reconnect_seconds": 0.0,
+                "disconnects": 0,
+                "blocks_sent": 0,
+                "blocks_skipped": 0,
+                "bytes_saved": 0,
+                "frames": 0,
+                "last_frame_start": None,
+                "frame_interval_ms": deque(maxlen=FRAME_HISTORY),
+                "frame_write_ms": deque(maxlen=FRAME_HISTORY),
+                "frame_usb_ms": deque(maxlen=FRAME_HISTORY),
+            }
+
+    def _count_frame(self, start, usb_start, sent, skipped, saved,
+                     dirty_enable):
+        """
+        Count a refresh (see get_stats) that started at start (a
+        best_timer time) when the total USB time was usb_start. It only
+        counts as a frame if dirty_enable (if any block was
+        invalidated).
+        """
+        now = best_timer()
+        stats = self._stats
+        with self._stats_lock:
+            stats["blocks_sent"] += sent
+            stats["blocks_skipped"] += skipped
+            stats["bytes_saved"] += saved
+            if not dirty_enable:
+                return
+            stats["frames"] += 1
+            last_start = stats["last_frame_start"]
+            if last_start is None:
+                stats["last_frame_start"] = start
+            elif start >= last_start:
+                # (A frame written during another, such as by
+                # reconnect, ends first but started later.)
+                stats["frame_interval_ms"].append(
+                    (start - last_start) * 1000.0
+                )
+                stats["last_frame_start"] = start
+            stats["frame_write_ms"].append((now - start) * 1000.0)
+            stats["frame_usb_ms"].append(
+                (stats["usb_seconds"] - usb_start) * 1000.0
+            )
+
+    def get_connection_state(self):
+        """
+        Get STATE_CONNECTED, STATE_DISCONNECTED or STATE_RECONNECTING.
+
+        When a write fails, the state becomes STATE_DISCONNECTED, and
+        every write fails fast (without USB) from then on, so drawing
+        only changes the framebuffer and invalidates blocks. Nothing
+        reconnects during drawing except try_reconnect (if
+        auto_reconnect_enable), which tries at most once per backoff
+        delay (see get_reconnect_delay). After reconnecting, the whole
+        framebuffer is written once (see reconnect).
+        """
+        if self._connected:
+            return STATE_CONNECTED
+        if self._reconnect_lock.locked():
+            return STATE_RECONNECTING
+        return STATE_DISCONNECTED
+
+    def get_reconnect_delay(self):
+        """
+        Get how many seconds try_reconnect waits before the next
+        attempt (0.0 if it may try now or if connected). The first
+        attempt after a disconnect is immediate, then the delay is
+        reconnect_min_delay, doubled after each failed attempt up to
+        reconnect_max_delay.
+        """
+        if self._connected:
+            return 0.0
+        return max(self._next_reconnect - best_timer(), 0.0)
+
+    def _set_disconnected(self, handle, error):
+        """
+        Change to STATE_DISCONNECTED if handle (that failed) is the
+        current handle.
+        """
+        with self._lock:
+            if (not self._connected) or (handle is not self.handle):
+                # A reconnect already replaced it.
+                return
+            self._connected = False
+            self.handle = None
+            self._reconnect_failures = 0
+            self._next_reconnect = best_timer()
+        with self._stats_lock:
+            self._stats["disconnects"] += 1
+        print("[ PicoLCD ] ERROR: writing failed ({}), so drawing will"
+              " only change the framebuffer until the device is"
+              " reconnected.".format(error))
+
+    def _auto_reconnect(self):
+        """
+        Try to reconnect if auto_reconnect_enable (see try_reconnect).
+
+        Returns:
+            True if connected
+        """
+        if self._connected:
+            return True
+        if not self.auto_reconnect_enable:
+            return False
+        return self.try_reconnect()
+
+    def try_reconnect(self, silent=True):
+        """
+        Reconnect (see reconnect) unless the backoff delay (see
+        get_reconnect_delay) has not passed or another thread is
+        already reconnecting. This never waits.
+
+        Returns:
+            True if connected
+        """
+        if self._connected:
+            return True
+        if best_timer() < self._next_reconnect:
+            return False
+        if not self._reconnect_lock.acquire(False):
+            return False
+        try:
+            return self._reconnect(silent)
+        finally:
+            self._reconnect_lock.release()
+
+    def reconnect(self, silent=False):
+        """
+        Connect again without erasing the framebuffer, then write all
+        of it (since the device may have been reset). This waits for
+        any other reconnect to finish, and ignores the backoff delay
+        (see try_reconnect).
+
+        Returns:
+            True if connected
+        """
+        with self._reconnect_lock:
+            return self._reconnect(silent)
+
+    def _reconnect(self, silent):
+        if self.trace_level >= TRACE_INFO:
+            self.blab("* {} is reconnecting...",
+                      sys._getframe(2).f_code.co_name, level=TRACE_INFO)
+        start = best_timer()
+        result = self.connect(silent=silent, enable_reset=False)
+        now = best_timer()
+        with self._stats_lock:
+            if result:
+                self._stats["reconnects"] += 1
+            else:
+                self._stats["reconnect_failures"] += 1
+            self._stats["reconnect_seconds"] += now - start
+        if result:
+            self._reconnect_failures = 0
+            # self.reset_framebuffer(enable_reconnect=False)
+            self.invalidate()
+            self.refresh(enable_reconnect=False)
+        else:
+            self._reconnect_failures += 1
+            self._next_reconnect = now + min(
+                self.reconnect_min_delay
+                * 2 ** min(self._reconnect_failures - 1, 16),
+                self.reconnect_max_delay
+            )
+        return result
+
+    def transfer_row(self, dst_br_i, src_br_i):
+        """
+        Transfer row src_br_i to dst_br_i then erase row src_br_i
+        (for graphics type models only!).
+
+        * does NOT refresh, but does invalidate so later refresh will
+        work
+        """
+        pitch = self._pitch
+        dst_i = dst_br_i * pitch
+        src_i = src_br_i * pitch
+        self.framebuffer[dst_i:dst_i+pitch] = \
+            self._fb_view[src_i:src_i+pitch]
+        self._fb_view[src_i:src_i+pitch] = self._zeros[:pitch]
+        for zone_i in range(self.dc["zones"]):
+            src_fb_i = src_br_i * self.dc["zones"] + zone_i
+            dst_fb_i = dst_br_i * self.dc["zones"] + zone_i
+            self._invalidate_block(src_fb_i)
+            self._invalidate_block(dst_fb_i)
+
+    def reset_row(self, blockrow_i):
+        """
+        Reset one row of block buffers.
+        (for graphics type models only!).
+
+        * does NOT refresh, but does invalidate so later refresh will
+        work
+        """
+        pitch = self._pitch
+        start = blockrow_i * pitch
+        self._fb_view[start:start+pitch] = self._zeros[:pitch]
+        for zone_i in range(self.dc["zones"]):
+            fb_i = blockrow_i * self.dc["zones"] + zone_i
+            self._invalidate_block(fb_i)
+
+    def scroll_rows(self, count):
+        """
+        Move every row of blocks up by count rows and erase the rows
+        uncovered at the bottom (for graphics type models only!).
+
+        * does NOT refresh, but does invalidate so later refresh will
+        work
+        """
+        pitch = self._pitch
+        size = len(self.framebuffer)
+        shift = count * pitch
+        if shift >= size:
+            self._fb_view[:] = self._zeros
+        elif shift > 0:
+            # Slicing the bytearray (not the memoryview) copies the
+            # source first, so the overlapping move is safe:
+            self.framebuffer[:size-shift] = self.framebuffer[shift:]
+            self._fb_view[size-shift:] = self._zeros[:shift]
+        for fb_i in range(len(self.change_enables)):
+            self._invalidate_block(fb_i)
+
+    def reset_framebuffer(self, enable_reconnect=True):
+        """
+        Erase the framebuffer (without refreshing the device).
+
+        The framebuffer is one bytearray in the device's native layout:
+        rows of blocks from top to bottom, where each row contains
+        every zone from left to right and each byte is a vertical
+        stripe of 8 pixels. The framebuffers list contains a memoryview
+        of each block (framebuffers[block_i * zones + zone_i]) so that
+        blocks can be read and written without copying.
+        """
+        if (self.dc is None) and enable_reconnect:
+            self._auto_reconnect()
+        if self.dc is None:
+            raise DisconnectedError("reconnect failed"
+                                    " in reset_framebuffer")
+        block_count = self.dc["blockrows"] * self.dc["zones"]
+        block_size = self.dc["block_size"]
+        size = block_count * block_size
+        with self._lock:
+            self.change_enables = [0] * block_count
+            self.change_starts = [0] * block_count
+            if (self.framebuffer is not None) and \
+                    (len(self.framebuffer) == size):
+                # Erase it in place so existing views stay valid.
+                self._fb_view[:] = self._zeros
+                return
+        self._pitch = self.dc["zones"] * block_size
+        self._zeros = memoryview(bytearray(size))
+        self._ones = memoryview(bytearray(b"\x01" * size))
+        self._shadow = bytearray(size)
+        self._shadow_known = bytearray(size)
+        self.framebuffer = bytearray(size)
+        self._fb_view = memoryview(self.framebuffer)
+        self.framebuffers = []
+        for fb_i in range(block_count):
+            start = fb_i * block_size
+            self.framebuffers.append(
+                self._fb_view[start:start+block_size]
+            )
+
+    def forget_device_state(self):
+        """
+        Forget what the device is showing, so that the next refresh
+        of each invalidated block writes it even if the block matches
+        what was last written (such as after a reconnect, in case the
+        device was reset).
+        """
+        if self._shadow_known is not None:
+            self._shadow_known[:] = self._zeros
+
+    def _changed_span(self, start, stop, source=None):
+        """
+        Get the part of the framebuffer from start to the exclusive
+        stop (indices of self.framebuffer) that differs from what the
+        device is known to show.
+
+        Keyword arguments:
+        source -- a copy of the framebuffer to check instead
+
+        Returns:
+            a (start, stop) tuple, or None if nothing differs
+        """
+        if source is None:
+            source = self._fb_view
+        unknown_i = self._shadow_known.find(0, start, stop)
+        diff = (int.from_bytes(source[start:stop], "little")
+                ^ int.from_bytes(self._shadow[start:stop], "little"))
+        if (unknown_i < 0) and (diff == 0):
+            return None
+        first = stop
+        last = start - 1
+        if diff != 0:
+            first = start + ((diff & -diff).bit_length() - 1) // 8
+            last = start + (diff.bit_length() - 1) // 8
+        if unknown_i > -1:
+            first = min(first, unknown_i)
+            last = max(last, self._shadow_known.rfind(0, start, stop))
+        return first, last + 1
+
+    def _remember_written(self, start, data):
+        """
+        Remember that the device acknowledged data written at start
+        (an index of self.framebuffer).
+        """
+        stop = start + len(data)
+        self._shadow[start:stop] = data
+        self._shadow_known[start:stop] = self._ones[:len(data)]
+
+    def _forget_written(self, start, stop):
+        self._shadow_known[start:stop] = self._zeros[:stop-start]
+
+    def smaller_rect(self, outline, offset=1):
+        return ((outline[0][0]+offset, outline[0][1]+offset),
+                (outline[1][0]-offset, outline[1][1]-offset))
+
+    def larger_rect(self, outline, offset=1):
+        return ((outline[0][0]-offset, outline[0][1]-offset),
+                (outline[1][0]+offset, outline[1][1]+offset))
+
+    def _cache_font(self, font_path, font_size, threshold):
+        is_ok = True
+
+        if font_size is None:
+            font_size = self.default_font_size
+        default_font_path = font_meta[self.default_font]["path"]
+        if font_path is None:
+            font_path = default_font_path
+            self.blab("reverted to default font '{}'", font_path)
+            if not os.path.isfile(font_path):
+                print("[ PicoLCD ] ERROR in draw_text:"
+                      + " missing default font '"
+                      + font_path + "'")
+                is_ok = False
+        elif not os.path.isfile(font_path):
+            try_path = os.path.join("fonts", font_path)
+            if os.path.isfile(try_path):
+                font_path = try_path
+            else:
+                print("[ PicoLCD ] ERROR in draw_text:"
+                      " font '" + font_path + "' not found.")
+                is_ok = False
+        if not is_ok:
+            return None, None, None
+
+        if threshold is None:
+            threshold = get_default_threshold(font_path, font_size)
+            self.blab("threshold was None so reverted to default: {}",
+                      threshold)
+        # NOTE: The font is loaded by glyph_atlas only if a glyph isn't
+        #   cached.
+        return font_path, font_size, threshold
+
+    def _get_text_draw(self):
+        """
+        Get an ImageDraw object for measuring text (the size of its
+        image doesn't matter for textbbox).
+        """
+        if self._text_draw is None:
+            self._text_draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+        return self._text_draw
+
+    def push_text(self, text, erase_behind_enable=False,
+                  refresh_enable=True, spacing_x=1, scroll_count=1):
+        """
+        This is an optimized vertical scrolling text function (It only
+        scrolls when necessary and it uses an 8-pixel-high font that
+        fits into one row of blocks, so each glyph from the glyph atlas is
+        written as one vertical stripe per column).
+        """
+
+        results = None, None
+        abs_x, abs_y = self._pos
+        self._require_dc()
+        dst_w = self.dc["width"]
+        dst_h = self.dc["height"]
+        font_path = font_meta[self.default_font]["path"]
+        font_size = self.default_font_size
+        threshold = .5
+        if self.dc["type"] != "graphics":
+            print("[ PicoLCD ] ERROR in push_text: this function"
+                  " is not implemented except for graphics type"
+                  " displays.")
+            return None, None
+        is_escaped = False
+        for c in text:
+            this_spacing_x = spacing_x
+            if len(c.strip()) > 0:
+                this_sc = self._get_stripes(
+                    self.glyph_atlas.get(font_path, font_size, threshold, c)
+                )
+            else:
+                # " " (space)
+                # less than width of ~6px wide letters:
+                this_sc = bytearray(int(font_size*.4))
+
+            if (c == "\\") and (not is_escaped):
+                is_escaped = True
+                continue
+            tab_w = 32
+            if c == "\n":
+                is_escaped = True
+                c = "n"
+            elif c == "\r":
+                is_escaped = True
+                c = "r"
+            elif c == "\t":
+                is_escaped = True
+                c = "t"
+
+            if is_escaped:
+                is_escaped = False
+                if c == "n":
+                    abs_x = 0
+                    abs_y += 8
+                    continue
+                elif c == "r":
+                    abs_x = 0
+                    continue
+                elif c == "t":
+                    abs_x += tab_w
+                    tab_slot_i = abs_x // tab_w
+                    abs_x = tab_slot_i * tab_w
+                    continue
+                # otherwise count it as a literal
+            if self.trace_level >= TRACE_WRITES:
+                self.blab("* writing stripes", level=TRACE_WRITES)
+            if abs_x + len(this_sc) > dst_w:
+                abs_x = 0
+                abs_y += 8
+            if abs_y + 8 > dst_h:  # == is ok since is exclusive rect
+                # then scroll
+                if scroll_count > len(this_sc):
+                    # NOTE: the length of stripe cache is the width
+                    # of the character, since each byte is one 1x8
+                    # 1-bit stripe.
+                    self.clear()
+                else:
+                    self.scroll_rows(scroll_count)
+                abs_y -= scroll_count * 8  # Size of byte is the
+                #                            mandatory font height for
+                #                            this method.
+                if abs_y < 0:
+                    abs_y = 0
+
+            block_i = abs_y // self.dc["ppb"]
+            count_x = min(len(this_sc), dst_w - abs_x)
+            if count_x > 0:
+                start = block_i * self._pitch + abs_x
+                self.framebuffer[start:start+count_x] = \
+                    this_sc[:count_x]
+                bs = self.dc["block_size"]
+                stop_x = abs_x + count_x
+                zones = range(abs_x // bs, (stop_x - 1) // bs + 1)
+                self.invalidate(zones=zones, blocks=[block_i],
+                                zone_start_x=abs_x % bs,
+                                zone_stop_x=(stop_x - 1) % bs + 1)
+            else:
+                count_x = 0
+            abs_x += count_x + spacing_x
+            # scrolling is caught next time, see start of method above
+        self._pos = abs_x, abs_y
+        if refresh_enable:
+            return self.refresh()
+        return False
+
+    def _get_stripes(self, glyph):
+        """
+        Get the part of a glyph (see GlyphAtlas) that is in the top 8
+        rows of the line, as one byte (vertical stripe) per column.
+        """
+        w = glyph["width"]
+        if w < 1:
+            return bytearray()
+        stripes = 0
+        ones = int.from_bytes(b"\x01" * w, "little")  # 1 in each byte
+        pages = glyph["pages"]
+        for page_i in range((glyph["height"] + 7) // 8):
+            shift = glyph["y"] + page_i * 8
+            if (shift >= 8) or (shift <= -8):
+                continue
+            value = int.from_bytes(pages[page_i*w:(page_i+1)*w], "little")
+            if shift >= 0:
+                stripes |= (value << shift) & (((0xFF << shift) & 0xFF)
+                                               * ones)
+            else:
+                stripes |= (value >> -shift) & ((0xFF >> -shift) * ones)
+        return bytearray(stripes.to_bytes(w, "little"))
+
+    def draw_text(self, row, col, text, font=None, font_path=None,
+                  font_size=None, threshold=None,
+                  erase_behind_enable=False, refresh_enable=True,
+                  erase_rect=None):
+        """
+        Draw text at the row and column specified, using 6x8 slots:
+        5x7 text (maximum, not monospaced) plus 1px spacing.
+
+        For information on other parameters, see the draw_text_at
+        documentation.
+        """
+        results = None, None
+        pos = col, row  # col,row format is y,x order
+        if self.dc["type"] == "graphics":
+            pos = (col * 6, row * 8)
+        return self.draw_text_at(
+            pos, text, font=font,
+            font_size=font_size,
+            threshold=threshold,
+            erase_behind_enable=erase_behind_enable,
+            refresh_enable=refresh_enable,
+            erase_rect=erase_rect)
+
+    def draw_text_at(self, pos, text, font=None, font_size=None,
+                     font_path=None, threshold=None,
+                     erase_behind_enable=False, refresh_enable=True,
+                     erase_rect=None):
+        """
+        Draw text to the (framebuffer and) LCD.
+
+        Keyword arguments:
+        row,col -- the y,x location (in that order; though if
+            picolcd.dc["type"] is graphics, it will be a pixel location
+            where row is the middle of the letters)
+        font -- If you provide the name of a prepackaged font (case
+            insensitive), then you do not have to specify font_path.
+            This option only works if picolcd.dc["type"] is "graphics".
+        font_path -- Specify a ttf file. This option only works for
+            devices where picolcd.dc["type"] is "graphics".
+        font_size -- Specify a font size in points. This option is only
+            available for devices where picolcd.dc["type"] is
+            "graphics".
+        threshold -- must be this opaque or higher--fine tuning may
+            improve readability for certain fonts at small sizes
+            (higher values make font slightly thinner). If None, .5
+            will be used (.02 if default font with font size > 8, to
+            catch edges of squares)
+        refresh_enable -- whether to write the invalidated area from the
+            framebuffers to the device (however, for text type devices,
+            this is ignored and data is always written)
+        erase_behind_enable -- erase behind (calculates rect unless
+            erase_rect is not None
+        erase_rect -- erase this rect first (turns on
+            erase_behind_enable automatically)
+
+        Returns:
+            Only if graphics type device, and only if
+            erase_behind_enable, the method returns rect actually drawn
+            in ((min_x, min_y), (max_x+1,max_y+1)) format (this can be
+            saved for your future use, such as if you do
+            refresh_enable=False just to get font metrics, then clear,
+            then draw what you really wanted, or just record the
+            numbers for future use so you don't have to repeat those
+            calls for each run--it is also not repeated inside of this
+            function if you pass an erase_rect)
+        """
+        results = None, None
+        if (font_path is None) and (font is not None):
+            meta = get_font_meta(font)
+            if meta is None:
+                raise ValueError("The font is not known. Try (case"
+                                 " doesn't matter):"
+                                 " {}".format(font_meta.keys()))
+            font_path = meta["path"]
+            if font_size is None:
+                default_size = meta.get("default_size")
+                if default_size is not None:
+                    font_size = default_size
+
+        if erase_rect is not None:
+            erase_behind_enable = True
+        if self.dc["type"] == "graphics":
+            # pos = (col, row)  # column is x, row is y
+            on_count = 0
+            font_path, font_size, threshold = \
+                self._cache_font(font_path, font_size, threshold)
+            if font_path is None:
+                return None, None
+            if erase_rect is not None:
+                self.blab("* drawing erase_rect")
+                self.draw_rect(erase_rect, False, refresh_enable=False)
+            # sprites are (pos, data, size, layout) tuples for blit:
+            sprites = []
+            drawn_rect = None
+            placed = None
+            if "\n" not in text:
+                # Use cached glyphs unless their edges overlap (see
+                # GlyphAtlas.layout):
+                placed = self.glyph_atlas.layout(font_path, font_size,
+                                                 threshold, text)
+            if placed is not None:
+                min_x, min_y = self.dc["width"], self.dc["height"]
+                end_x, end_y = 0, 0
+                for x, glyph in placed:
+                    if glyph["width"] < 1:
+                        continue
+                    glyph_pos = (pos[0] + x + glyph["x"], pos[1] + glyph["y"])
+                    glyph_size = (glyph["width"], glyph["height"])
+                    sprites.append((glyph_pos, glyph["pages"], glyph_size,
+                                    "pages"))
+                    min_x = min(min_x, glyph_pos[0])
+                    min_y = min(min_y, glyph_pos[1])
+                    end_x = max(end_x, glyph_pos[0] + glyph_size[0])
+                    end_y = max(end_y, glyph_pos[1] + glyph_size[1])
+                if sprites:
+                    drawn_rect = ((min_x, min_y), (end_x, end_y))
+                    if ((min_x < 0) or (min_y < 0)
+                            or (end_x > self.dc["width"])
+                            or (end_y > self.dc["height"])):
+                        # Let the rasterizer clip the text (and the
+                        # rectangle to erase) to the display.
+                        placed = None
+            if placed is None:
+                sprites, drawn_rect = self._rasterize_text(
+                    pos, text,
+                    self.glyph_atlas.get_font(font_path, font_size),
+                    threshold
+                )
+            if drawn_rect is not None:
+                on_count = 1  # (for the warning below)
+                if erase_behind_enable and (erase_rect is None):
+                    results = drawn_rect
+                    self.draw_rect(results, False, refresh_enable=False)
+                self.blab("* drawing text")
+                for sprite_pos, data, sprite_size, layout in sprites:
+                    self.blit(sprite_pos, data, sprite_size, op="or",
+                              layout=layout, refresh_enable=False)
+            if on_count < 1:
+                print("[ PicoLCD ] WARNING in draw_text: offscreen"
+                      + " buffer had " + str(on_count)
+                      + " text pixels")
+            if refresh_enable:
+                self.refresh()
+            return results
+        else:
+            col, row = pos  # col, row format is in y,x order
+            addr = {0: 0x80, 1: 0xc0, 2: 0x94, 3: 0xd4}[row] + col
+            self.blab("* send 0x94 command (non-graphics text)",
+                      level=TRACE_WRITES)
+            result = self.wr(bytes(0x94, 0x00, 0x01, 0x00, 0x64, addr))
+            if result < 1:
+                print("[ pypicolcd ] ERROR: " + str(result)
+                      + "byte(s) written for address")
+            self.blab("* send OUT_REPORT_DATA command",
+                      level=TRACE_WRITES)
+            self.wr(bytes(OUT_REPORT_DATA, 0x01, 0x00, 0x01, len(text))
+                    + text)
+
+    def _rasterize_text(self, pos, text, fnt, threshold):
+        """
+        Render text using PIL (only the part of the display that the
+        text covers, according to the font metrics).
+
+        Returns:
+            a tuple of a list of sprites (in the format used by
+            draw_text_at) and the rect of the pixels that are on (or
+            an empty list and None if no pixels are on)
+        """
+        left, top, right, bottom = self._get_text_draw().textbbox(
+            pos, text, font=fnt
+        )
+        min_x = max(left, 0)
+        min_y = max(top, 0)
+        end_x = min(right, self.dc["width"])
+        end_y = min(bottom, self.dc["height"])
+        if (min_x >= end_x) or (min_y >= end_y):
+            return [], None
+        mask = Image.new('L', (end_x - min_x, end_y - min_y), 0)
+        self.blab("* drawing text '{}' at {} using fnt {} on PIL"
+                  " Draw object", text, pos, fnt)
+        # TODO: _d.text sometimes causes
+        # `Segmentation fault (core dumped)`
+        # or
+        # ```
+        # corrupted size vs. prev_size
+        # Aborted (core dumped)
+        # ```:
+        # or
+        # ```
+        # munmap_chunk(): invalid pointer
+        # lcd-fb.service: Main process exited, code=dumped, status=6/ABRT
+        # lcd-fb.service: Failed with result 'core-dump'.
+        # ```
+        ImageDraw.Draw(mask).text((pos[0] - min_x, pos[1] - min_y),
+                                  text, font=fnt, fill=255)
+        # The mask is the opacity of the text, so on is
+        # opacity >= threshold:
+        bits = mask.point(self.glyph_atlas.get_threshold_table(threshold),
+                          '1')
+        bbox = bits.getbbox()
+        if bbox is None:
+            return [], None
+        bits = bits.crop(bbox)
+        drawn_rect = ((min_x + bbox[0], min_y + bbox[1]),
+                      (min_x + bbox[2], min_y + bbox[3]))
+        return [(drawn_rect[0], bits.tobytes(), bits.size, "rows")], \
+            drawn_rect
+
+    # draw image to lcd (bigger than screen or negative pos is ok)
+    # pos: (x,y) coords for where to place left top corner of image
+    # threshold: lightness (r+g+b/765) must be threshold or higher,
+    #   to be white (not set) otherwise is black (on)
+    #   if left at default, dithering will be used instead
+    # brightness: multiplier for dithering, so only applies if
+    #   threshold=None
+    def draw_image(self, pos, path, threshold=None, invert_enable=False,
+                   brightness=1.0, refresh_enable=True):
+        """
+        Draw an image to the (framebuffer and) LCD. Only the part of
+        the image that is on the display is converted (see
+        image_to_pages for the meaning of the other keyword arguments).
+
+        Sequential arguments:
+        pos -- the (x, y) location for the top left corner of the image
+            (may be negative)
+        path -- the image file
+
+        Keyword arguments:
+        refresh_enable -- whether to write the invalidated area from the
+            framebuffer to the device (if False, call refresh later)
+        """
+        try:
+            im = Image.open(path)
+            width, height = im.size
+            dst_w = self.dc["width"]
+            dst_h = self.dc["height"]
+            min_x = max(pos[0], 0)
+            min_y = max(pos[1], 0)
+            end_x = min(pos[0] + width, dst_w)
+            end_y = min(pos[1] + height, dst_h)
+            if (min_x < end_x) and (min_y < end_y):
+                src_x = min_x - pos[0]
+                src_y = min_y - pos[1]
+                w = end_x - min_x
+                h = end_y - min_y
+                rgb_im = im.convert('RGB')
+                if (w, h) != (width, height):
+                    rgb_im = rgb_im.crop((src_x, src_y, src_x + w,
+                                          src_y + h))
+                pages = image_to_pages(rgb_im, threshold=threshold,
+                                       invert_enable=invert_enable,
+                                       brightness=brightness)
+                self.blit((min_x, min_y), pages, (w, h), layout="pages",
+                          refresh_enable=False)
+            if refresh_enable:
+                self.refresh()
+        except Exception as e:
+            print("[ PicoLCD ] ERROR--could not finish loading image:"
+                  " {}".format(e))
+            # view_traceback()
+
+    # Invalidate rectangle of lcd to force refresh to refresh them
+    #   next time refresh is called (if no params, then entire screen:
+    #   zones 0 to picolcd.dc["zones"]
+    #   and blocks 0 to picolcd.dc["blockrows"])
+    # If you want a non-rectangle, set framebuffer numbers in
+    #   picolcd.change_enables (and picolcd.change_starts) manually
+    #   instead.
+    # zones: list of zone indices where each index is 0 to
+    #   picolcd.dc["zones"]
+    # zone_stop_x: refresh part of last zone in zone list (if -1,
+    #   refresh entire zone; if 0, do not refresh anything so calling
+    #   this method was a waste of time)
+    # zone_start_x: refresh part of first zone in zone list, starting
+    #   at this x (relative to the zone)
+    def invalidate(self, zones=None, blocks=None, zone_stop_x=-1,
+                   enable_reconnect=True, zone_start_x=0):
+        if self.dc is None:
+            # The size of the display is not known yet.
+            if not (enable_reconnect and self._auto_reconnect()):
+                return False
+        self.invalidate_dt = datetime.now()
+        if self.trace_level >= TRACE_DEBUG:
+            self.blab("* invalidate")
+        if zones is None:
+            zones = range(self.dc["zones"])
+        if blocks is None:
+            blocks = range(self.dc["blockrows"])
+        # NOTE: Even zones are not skipped when odd zones are
+        #   invalidated, since refresh_block only rewrites the last byte
+        #   of an even zone in order to reach the odd zone.
+        zl = len(zones)
+        for block_i in blocks:
+            for zii in range(zl):
+                zsx = -1
+                if zii == zl - 1:
+                    zsx = zone_stop_x
+                fb_i = block_i * self.dc["zones"] + zones[zii]
+                if zii == 0:
+                    self._invalidate_block(fb_i, zone_start_x, zsx)
+                else:
+                    self._invalidate_block(fb_i, 0, zsx)
+                # self.refresh_block(zone_i, block_i)
+
+    def _invalidate_block(self, fb_i, zone_start_x=0, zone_stop_x=-1):
+        """
+        Mark part of a block as changed, without forgetting any part
+        that was already marked as changed and not yet refreshed.
+
+        Keyword arguments:
+        zone_start_x -- the start of the changed part of the zone
+        zone_stop_x -- the exclusive end of the changed part of the
+            zone (-1 for the entire rest of the zone)
+        """
+        if zone_stop_x == 0:
+            return
+        with self._lock:
+            prev_stop_x = self.change_enables[fb_i]
+            if prev_stop_x == 0:
+                self.change_starts[fb_i] = zone_start_x
+                self.change_enables[fb_i] = zone_stop_x
+                return
+            if zone_start_x < self.change_starts[fb_i]:
+                self.change_starts[fb_i] = zone_start_x
+            if prev_stop_x < 0:
+                return
+            if (zone_stop_x < 0) or (zone_stop_x > prev_stop_x):
+                self.change_enables[fb_i] = zone_stop_x
+
+    def refresh(self, enable_reconnect=True):
+        """
+        Refresh all or part of lcd from framebuffers where invalidated
+        (where set_pixel was called or other operation was done). For
+        advanced use, such as if you drew to a framebuffer manually,
+        call invalidate first to inform PicoLCD which framebuffers
+        changed.
+
+        In asynchronous mode (see set_async_enable), this only wakes
+        the writer thread and returns True immediately (call flush to
+        wait for the writes). During a frame (see frame), or if the
+        frame rate limit (see set_max_fps) does not allow writing yet,
+        this returns True and the changes are written later.
+
+        Afterward, blocks_sent is the number of invalidated blocks that
+        were written, and blocks_skipped is the number of blocks that
+        were not sent since they had not changed or already matched
+        what the device shows.
+        """
+        if threading.current_thread() is not self._writer:
+            with self._lock:
+                if self._frame_depth > 0:
+                    return True
+                if self._min_frame_interval > 0:
+                    delay = self._get_frame_delay()
+                    if delay > 0:
+                        if self._frame_timer is None:
+                            self._frame_timer = threading.Timer(
+                                delay, self._on_frame_timer
+                            )
+                            self._frame_timer.daemon = True
+                            self._frame_timer.start()
+                        return True
+                    self.generate_fps()
+        return self._push(enable_reconnect=enable_reconnect)
+
+    def _push(self, enable_reconnect=True):
+        """
+        Write the invalidated blocks now, or in asynchronous mode (see
+        set_async_enable) wake the writer thread, regardless of frames
+        (see refresh).
+        """
+        if self.async_enable and \
+                (threading.current_thread() is not self._writer):
+            with self._cond:
+                self._refresh_requested = True
+                self._cond.notify_all()
+            return True
+        if not self._connected:
+            # Keep the changes invalidated for the resync (see
+            # reconnect) instead of waiting for USB timeouts.
+            if not (enable_reconnect and self._auto_reconnect()):
+                return False
+        if self.trace_level >= TRACE_DEBUG:
+            self.blab("* refresh")
+        try:
+            self._refresh_dirty(enable_reconnect=enable_reconnect)
+        except DisconnectedError:
+            # The rest stays invalidated (see _refresh_dirty).
+            return False
+        return self._connected
+
+    def _refresh_dirty(self, enable_reconnect=True):
+        """
+        Write the changed part of each block. The changed parts are
+        taken (and cleared) and the framebuffer is copied while holding
+        the lock, so that other threads can keep drawing (and marking
+        blocks as changed again) during the writes. A block that fails
+        to be written is marked as changed again.
+
+        The two zones of each chip on each page are planned together
+        (see _write_chip_page), so that the even zone is not written
+        again on the way to the odd zone. Afterward, bytes_sent is the
+        number of bytes written, and bytes_saved is how many fewer that
+        is than writing each invalidated block whole (as refresh did
+        before it was planned, where each odd zone also required the
+        whole even zone).
+        """
+        with self._lock:
+            stops = self.change_enables
+            starts = self.change_starts
+            self.change_enables = [0] * len(stops)
+            self.change_starts = [0] * len(starts)
+            source = memoryview(bytearray(self._fb_view))
+        start = best_timer()
+        usb_start = self._stats["usb_seconds"]
+        zones = self.dc["zones"]
+        bs = self.dc["block_size"]
+        sent = 0
+        skipped = 0
+        bytes_sent = 0
+        unplanned_count = 0  # bytes if each block were written whole
+        try:
+            for even_fb_i in range(0, len(stops), 2):
+                odd_fb_i = even_fb_i + 1
+                if (stops[even_fb_i] == 0) and (stops[odd_fb_i] == 0):
+                    skipped += 2
+                    continue
+                even_span = None
+                odd_stop_x = 0
+                if stops[even_fb_i] != 0:
+                    unplanned_count += _CMD3_HEADER_LEN + bs
+                    even_span = self._get_dirty_span(
+                        even_fb_i, starts[even_fb_i], stops[even_fb_i],
+                        source
+                    )
+                if stops[odd_fb_i] != 0:
+                    unplanned_count += (_CMD3_HEADER_LEN + bs
+                                        + _CMD4_HEADER_LEN + bs)
+                    odd_span = self._get_dirty_span(
+                        odd_fb_i, 0, stops[odd_fb_i], source
+                    )
+                    if odd_span is not None:
+                        odd_stop_x = odd_span[1]
+                written = 0
+                if (even_span is not None) or (odd_stop_x > 0):
+                    written = self._write_chip_page(
+                        even_fb_i // zones, (even_fb_i % zones) // 2,
+                        even_span, odd_stop_x, source,
+                        enable_reconnect=enable_reconnect
+                    )
+                bytes_sent += written
+                for fb_i in (even_fb_i, odd_fb_i):
+                    stop_x = stops[fb_i]
+                    if stop_x == 0:
+                        skipped += 1
+                        continue
+                    stops[fb_i] = 0
+                    if self._get_dirty_span(fb_i, starts[fb_i], stop_x,
+                                            source) is not None:
+                        # The write failed.
+                        self._invalidate_block(fb_i, starts[fb_i], stop_x)
+                    elif written > 0:
+                        sent += 1
+                    else:
+                        # It already matched what the device shows.
+                        skipped += 1
+        finally:
+            # If there was an exception, write the rest next time:
+            for fb_i in range(len(stops)):
+                if stops[fb_i] != 0:
+                    self._invalidate_block(fb_i, starts[fb_i], stops[fb_i])
+            self.blocks_sent = sent
+            self.blocks_skipped = skipped
+            self.bytes_sent = bytes_sent
+            self.bytes_saved = max(unplanned_count - bytes_sent, 0)
+            self._count_frame(start, usb_start, sent, skipped,
+                              self.bytes_saved, unplanned_count > 0)
+
+    def _get_dirty_span(self, fb_i, zone_start_x, zone_stop_x, source):
+        """
+        Get the part of a block from zone_start_x to the exclusive
+        zone_stop_x (-1 for the end of the block) that differs from
+        what the device shows.
+
+        Returns:
+            a (start_x, stop_x) tuple relative to the zone, or None
+        """
+        bs = self.dc["block_size"]
+        if zone_stop_x < 0:
+            zone_stop_x = bs
+        base = fb_i * bs
+        span = self._changed_span(base + zone_start_x, base + zone_stop_x,
+                                  source=source)
+        if span is None:
+            return None
+        return span[0] - base, span[1] - base
+
+    def set_async_enable(self, enable):
+        """
+        Turn the asynchronous transfer mode on or off. In this mode,
+        drawing only changes the framebuffer and marks the changed
+        blocks, and refresh (including the refresh that drawing methods
+        do by default) only wakes a writer thread that writes the
+        changed blocks to the device. A block that changes again before
+        it is written is only written once. Call flush to wait for the
+        writes.
+
+        Turning it off waits for the writer thread to finish writing.
+        """
+        if enable:
+            if self._writer is None:
+                self._writer_stop = False
+                self._writer = threading.Thread(target=self._write_loop,
+                                                name="PicoLCD writer")
+                self._writer.daemon = True
+                self.async_enable = True
+                self._writer.start()
+        elif self._writer is not None:
+            self.flush()
+            with self._cond:
+                self._writer_stop = True
+                self._cond.notify_all()
+            self._writer.join()
+            self._writer = None
+            self.async_enable = False
+
+    def flush(self, timeout=None):
+        """
+        Write the invalidated blocks now (even during a frame or if
+        set_max_fps would defer them), or in asynchronous mode (see
+        set_async_enable), wait for the writer thread to write them.
+
+        Keyword arguments:
+        timeout -- stop waiting after this many seconds (if not None)
+
+        Returns:
+            False if the device is not connected or timeout seconds
+            passed first, otherwise True
+        """
+        with self._lock:
+            self._cancel_frame_timer()
+        if (not self.async_enable) or \
+                (threading.current_thread() is self._writer):
+            return self._push()
+        with self._cond:
+            self._refresh_requested = True
+            self._cond.notify_all()
+            done = self._cond.wait_for(
+                lambda: not (self._refresh_requested or self._writing),
+                timeout
+            )
+        return done and self.ready()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not (self._refresh_requested or self._writer_stop):
+                    self._cond.wait()
+                if not self._refresh_requested:
+                    break
+                self._refresh_requested = False
+                self._writing = True
+            try:
+                # This thread is the writer, so refresh writes:
+                self.refresh()
+            except Exception as e:
+                print("[ PicoLCD ] ERROR in the writer thread: {}"
+                      "".format(e))
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def refresh_block(self, zone_i, block_i, zone_stop_x=-1,
+                      enable_reconnect=True, zone_start_x=0):
+        """
+        Refresh all or part of an lcd block from the matching
+        framebuffer. The block stays invalidated (see change_enables)
+        unless every write succeeds and covers the invalidated part of
+        the block, so a later refresh (such as after reconnecting) will
+        still send it.
+
+        Keyword arguments:
+        zone_stop_x -- refresh part of zone (if -1,
+          refresh entire zone; if 0, do not refresh anything so calling
+          this method was a waste of time); this method changes fps of
+          drawing one character at a time from 7.6 to 8.1 (though goes
+          back down over time probably since characters overlap block
+          edges)
+        zone_start_x -- start refreshing at this x (relative to the
+          zone) using the column address of the chip. This only
+          applies to even zones: An odd zone can only be reached by
+          writing the last byte of the even zone (so that positioning
+          continues into the odd zone), so an odd zone is always
+          refreshed from its first byte.
+
+        Only the part of the span that differs from what the device was
+        last known to show is written (see forget_device_state).
+
+        Returns:
+            the number of bytes written (0 if the write failed or if
+            the span already matched what the device shows)
+        """
+        if self.trace_level >= TRACE_DEBUG:
+            self.blab("* refresh zone {} block {}", zone_i, block_i)
+        if zone_stop_x == 0:
+            return 0
+        if zone_stop_x < 0:
+            zone_stop_x = self.dc["block_size"]
+        fb_i = block_i * self.dc["zones"] + zone_i
+        if zone_i % 2 == 1:
+            # An odd zone is always written from its first byte (see
+            # _write_chip_page), so only the end of the span can be
+            # trimmed.
+            zone_start_x = 0
+        # Only write what differs from what the device already shows:
+        span = self._get_dirty_span(fb_i, zone_start_x, zone_stop_x,
+                                    self._fb_view)
+        result = 0
+        if span is not None:
+            if zone_i % 2 == 1:
+                result = self._write_chip_page(
+                    block_i, zone_i // 2, None, span[1], self._fb_view,
+                    enable_reconnect=enable_reconnect
+                )
+                if result > 0:
+                    # The end of the even zone was written on the way:
+                    self._validate_block(fb_i - 1,
+                                         self.dc["block_size"] - 1,
+                                         self.dc["block_size"])
+            else:
+                result = self._write_chip_page(
+                    block_i, zone_i // 2, span, 0, self._fb_view,
+                    enable_reconnect=enable_reconnect
+                )
+            if result < 1:
+                return 0
+        self._validate_block(fb_i, zone_start_x, zone_stop_x)
+        return result
+
+    def _write_chip_page(self, block_i, chip_i, even_span, odd_stop_x,
+                         source, enable_reconnect=True):
+        """
+        Write changed parts of both zones of a chip on one page (row of
+        blocks) using as few bytes as possible.
+
+        The even zone (the left side of a chip) is written using the
+        long command (cmd3) starting at a column address. An odd zone
+        can only be reached by relative positioning after writing up to
+        the end of the even zone, so it is written by a short command
+        (cmd4) after a cmd3 that ends at the last byte of the even zone.
+        If both zones changed, that cmd3 starts at the changed part of
+        the even zone if that costs less than a separate cmd3 for it.
+
+        Sequential arguments:
+        even_span -- the (start_x, stop_x) of the even zone to write, or
+            None
+        odd_stop_x -- write the odd zone from its first byte to this
+            exclusive stop (0 to not write the odd zone)
+        source -- the framebuffer (or a copy of it) to write
+
+        Returns:
+            the number of bytes written, or 0 if any write failed
+        """
+        bs = self.dc["block_size"]
+        even_base = (block_i * self.dc["zones"] + chip_i * 2) * bs
+        odd_base = even_base + bs
+        chipsel = chip_i << 2
+        lead_start_x = bs - 1  # where the cmd3 before the cmd4 starts
+        if (odd_stop_x > 0) and (even_span is not None):
+            separate_count = (_CMD3_HEADER_LEN + even_span[1]
+                              - even_span[0] + _CMD3_HEADER_LEN + 1)
+            merged_count = _CMD3_HEADER_LEN + bs - even_span[0]
+            if merged_count <= separate_count:
+                lead_start_x = even_span[0]
+                even_span = None
+        # The cmd4 depends on where the cmd3 before it ended:
+        with self._usb_lock:
+            result = 0
+            if even_span is not None:
+                if self.trace_level >= TRACE_WRITES:
+                    self.blab("* write even zone", level=TRACE_WRITES)
+                written = self._write_cmd3(block_i, chipsel, even_base,
+                                           even_span[0], even_span[1], source,
+                                           enable_reconnect)
+                if written < 1:
+                    return 0
+                result += written
+            if odd_stop_x > 0:
+                if self.trace_level >= TRACE_WRITES:
+                    self.blab("* write end of even zone", level=TRACE_WRITES)
+                written = self._write_cmd3(block_i, chipsel, even_base,
+                                           lead_start_x, bs, source,
+                                           enable_reconnect)
+                if written < 1:
+                    return 0
+                result += written
+                # NOTE: The data is appended straight from the framebuffer
+                # (or source) memoryview into the bytearray commands.
+                cmd4 = bytearray((
+                    OUT_REPORT_DATA,
+                    chipsel | 0x01,
+                    0x00,
+                    0x00,
+                    odd_stop_x  # [4] data length
+                ))
+                cmd4 += source[odd_base:odd_base+odd_stop_x]
+                if self.trace_level >= TRACE_WRITES:
+                    self.blab("* write odd zone", level=TRACE_WRITES)
+                written = self.wr(cmd4, enable_reconnect=enable_reconnect)
+                if written < 1:
+                    self._forget_written(odd_base, odd_base + odd_stop_x)
+                    return 0
+                result += written
+                self._remember_written(odd_base, cmd4[_CMD4_HEADER_LEN:])
+            return result
+
+    def _write_cmd3(self, block_i, chipsel, base, start_x, stop_x, source,
+                    enable_reconnect):
+        cmd3 = bytearray((
+            OUT_REPORT_CMD_DATA,
+            chipsel,
+            0x02,
+            0x00,
+            0x00,
+            0xb8 | block_i,  # [5] 0xb8|line,
+            0x00,
+            0x00,
+            0x40 | start_x,  # [8] 0x40|column
+            0x00,
+            0x00,
+            stop_x - start_x  # [11] data length
+        ))
+        cmd3 += source[base+start_x:base+stop_x]
+        written = self.wr(cmd3, enable_reconnect=enable_reconnect)
+        if written < 1:
+            self._forget_written(base + start_x, base + stop_x)
+            return 0
+        self._remember_written(base + start_x, cmd3[_CMD3_HEADER_LEN:])
+        return written
+
+    def _validate_block(self, fb_i, zone_start_x, zone_stop_x):
+        """
+        Mark a block as unchanged if the part of it that was written
+        (from zone_start_x to the exclusive zone_stop_x) covers the
+        part that was marked as changed.
+        """
+        dirty_stop_x = self.change_enables[fb_i]
+        if dirty_stop_x == 0:
+            return
+        if dirty_stop_x < 0:
+            dirty_stop_x = self.dc["block_size"]
+        if (zone_start_x <= self.change_starts[fb_i]) and \
+                (zone_stop_x >= dirty_stop_x):
+            self.change_enables[fb_i] = 0
+            self.change_starts[fb_i] = 0
+
+    def get_pixel(self, pos):
+        """Get a one-bit pixel.
+
+        Returns
+            A boolean value indicating whether the pixel value is
+            currently 1 according to the framebuffer.
+        """
+        x, y = pos
+        dst_w = self.dc["width"]
+        dst_h = self.dc["height"]
+        if x < 0 or y < 0 or x >= dst_w or y >= dst_h:
+            raise RuntimeError("[ PicoLCD ] ERROR in get_pixel: "
+                               + str(pos) + " is not within the"
+                               + " {}x{} display.".format(dst_w, dst_h))
+        ppb = self.dc["ppb"]
+        result = self.framebuffer[(y // ppb) * self._pitch + x]
+        return (result & (1 << (y % ppb))) > 0
+
+    def set_pixel(self, pos, on, refresh_enable=True,
+                  force_refresh_enable=False):
+        """
+        Set a one-bit pixel to the value of on (invalidate block if
+        pixel differs from framebuffer or force_refresh_enable is True).
+
+        Sequential arguments:
+        on -- determines whether to turn the pixel on or off
+
+        Keyword arguments:
+        refresh_enable -- draw the affected block from framebuffers
+            (if False, you will have to call refresh later (which will
+            draw all invalidated blocks automatically)
+        force_refresh_enable -- draw even if the pixel does not differ
+            from framebuffer
+        """
+        # NOTE: one byte covers 8 pixels on y axis from landscape view
+        x, y = pos
+        if force_refresh_enable:
+            refresh_enable = True
+        self._require_dc()
+        dst_w = self.dc["width"]
+        dst_h = self.dc["height"]
+        if x < 0 or y < 0 or x >= dst_w or y >= dst_h:
+            return 0
+        block_size = self.dc["block_size"]
+        zone_i = x // block_size
+        block_i = y // self.dc["ppb"]
+        fb_i = block_i * self.dc["zones"] + zone_i
+        byte_i = x % block_size
+        pixel = 1 << (y % self.dc["ppb"])
+        i = block_i * self._pitch + x
+        if force_refresh_enable:
+            self._forget_written(i, i + 1)
+        result = self.framebuffer[i]
+        # TODO: account for "inverted" mode
+        if on:
+            if result | pixel != result:
+                self.framebuffer[i] = result | pixel
+                self._invalidate_block(fb_i, byte_i, byte_i + 1)
+            else:
+                if not force_refresh_enable:
+                    refresh_enable = False
+                else:
+                    self._invalidate_block(fb_i, byte_i, byte_i + 1)
+        else:
+            if result & pixel > 0:
+                self.framebuffer[i] = result ^ pixel
+                self._invalidate_block(fb_i, byte_i, byte_i + 1)
+            else:
+                if not force_refresh_enable:
+                    refresh_enable = False
+                else:
+                    self._invalidate_block(fb_i, byte_i, byte_i + 1)
+        if refresh_enable:
+            if self._refresh_is_deferred() or not self._connected:
+                self.refresh()
+            else:
+                self.refresh_block(zone_i, block_i,
+                                   zone_stop_x=self.change_enables[fb_i],
+                                   zone_start_x=self.change_starts[fb_i])
+
+    def set_preview_flag(self, dirty):
+        self.preview_flag = dirty
+
+    def ready(self):
+        """
+        Check whether the device is connected (drawing still changes
+        the framebuffer while it is not; see get_connection_state).
+        """
+        return self._connected
+
+    def _require_dc(self):
+        """
+        Make sure that the device characteristics (such as the size of
+        the framebuffer) are known, which requires connecting once.
+        """
+        if self.dc is None:
+            self._auto_reconnect()
+        if self.dc is None:
+            raise DisconnectedError("The device is not connected.")
+
+    def set_byte(self, pos, dat_b, refresh_enable=True,
+                 force_refresh_enable=False):
+        """
+        Set a byte (1x8 pixel vertical strip) on the LCD.
+
+        Keyword arguments:
+        dat_b -- one byte containing (8) 1-bit pixels VERTICALLY
+        """
+        # NOTE: one byte covers 8 pixels on y axis from landscape view
+        self._require_dc()
+        x, y = pos
+        if force_refresh_enable:
+            refresh_enable = True
+        dst_w = self.dc["width"]
+        dst_h = self.dc["height"]
+        if x < 0 or y < 0 or x >= dst_w or y >= dst_h:
+            return 0
+        block_size = self.dc["block_size"]
+        zone_i = x // block_size
+        block_i = y // self.dc["ppb"]
+        fb_i = block_i * self.dc["zones"] + zone_i
+        byte_i = x % block_size
+        i = block_i * self._pitch + x
+        if force_refresh_enable:
+            self._forget_written(i, i + 1)
+        # TODO: account for "inverted" mode
+        if dat_b != self.framebuffer[i]:
+            self.framebuffer[i] = dat_b
+            self._invalidate_block(fb_i, byte_i, byte_i + 1)
+        else:
+            if not force_refresh_enable:
+                refresh_enable = False
+            else:
+                self._invalidate_block(fb_i, byte_i, byte_i + 1)
+        if refresh_enable:
+            if self._refresh_is_deferred() or not self._connected:
+                self.refresh()
+            else:
+                self.refresh_block(zone_i, block_i,
+                                   zone_stop_x=self.change_enables[fb_i],
+                                   zone_start_x=self.change_starts[fb_i])
+
+    def clear(self, enable_reconnect=True):
+        self.reset_framebuffer(enable_reconnect=enable_reconnect)
+        self.invalidate(enable_reconnect=enable_reconnect)
+        self.refresh(enable_reconnect=enable_reconnect)
+        self.preview_flag = True
+
+    def set_backlight_f(self, level, enable_reconnect=True):
+        """
+        Set the backlight level.
+
+        Sequential arguments:
+        level -- a float, 0.0-1.0, for the backlight, where 1.0 is 100%
+        """
+        try:
+            self.set_backlight(self, int(round(level*255.0)),
+                               enable_reconnect=enable_reconnect)
+        except ValueError:
+            raise ValueError("The level must be 0.0-1.0")
+
+    def set_backlight(self, level, enable_reconnect=True):
+        """
+        Set the backlight level.
+
+        Sequential arguments:
+        level -- an integer, 0-255, for the backlight, where 255 is 100%
+        """
+        # NOTE: NOT 1-1000, default 800 as asserted by
+        # mhswa Aug 27, 2018:
+        # https://forum.netgate.com/topic/134151/lcd4linux-picolcd/8
+        try:
+            b = int(level)
+        except TypeError:
+            raise TypeError("The level must be an integer 0-255")
+        if b != level:
+            raise TypeError("The level must be an integer 0-255")
+        if (b >= 0) and (b <= 255):
+            # Remember it first so that connect restores it:
+            self._backlight_level = b
+            self.wr([OUT_REPORT_LCD_BACKLIGHT, b],
+                    enable_reconnect=enable_reconnect)
+        else:
+            raise ValueError("The level must be 0-255")
+
+    def leds(self, state):
+        # TODO: test this, and do something with the return
+        self.wr([OUT_REPORT_LED_STATE, state])
+
+    def flash(self):
+        prev_level = self._backlight_level
+        # for level in (list(range(20, 0, -1)) + list(range(0, 21))):
+        standard_step = 10
+        step = standard_step
+        flash_max = 255
+        flash_min = 0
+        if flash_min < prev_level:
+            # This is always True unless flash_min is not 0
+            step *= -1
+        levels = list(range(prev_level, flash_min, step))
+        levels += list(range(flash_min, flash_max, standard_step))
+        step = standard_step
+        if prev_level < flash_max:
+            # This is always True unless flash_max is not 255
+            step *= -1
+        levels += list(range(flash_max, prev_level, step))
+
+        for level in levels:
+            self.set_backlight(level)
+            time.sleep(.01)
+        self.set_backlight(prev_level)
+
+
+if __name__ == "__main__":
+    from datetime import datetime
+    p = None
+    if p is None:
+        p = PicoLCD()
+    if p.dc is None:
+        error = p.error
+        if error is None:
+            error = "ERROR: Could not load device for unknown reason."
+            print(error)
+        # else error was already printed by p
+        exit(1)
+    p.clear()
+    p.draw_text(0, 0, "It worked!")
+    y = 3
+    pixel_y = round(p.dc["height"] / 2)
+    if pixel_y > y:
+        y = pixel_y
+    p.draw_text(y, 0, datetime.now().ctime()[:20])
+    print("You can use this module like:")
+    print("  from pypicolcd import PicoLCD")
+    print("  p = PicoLCD()")
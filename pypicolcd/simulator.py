@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+Simulate a picoLCD 256x64 so that drawing (and anything using PicoLCD,
+such as lcd-fb) can be tested and timed without the device.
+Copyright (C) 2018  Jake Gustafson
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Pass a SimulatedDevice as the device option of PicoLCD:
+
+    from pypicolcd import PicoLCD
+    from pypicolcd.simulator import SimulatedDevice
+    device = SimulatedDevice(latency=.001)
+    p = PicoLCD(device=device)
+    p.draw_text_at((0, 0), "Hello")
+    device.get_image().save("hello.png")
+
+The device decodes the same reports that PicoLCD writes to the real
+device into a virtual panel. The panel memory uses the same layout as
+PicoLCD.framebuffer, so the two can be compared directly.
+"""
+
+import time
+import random
+import threading
+
+import usb
+import usb.core
+from PIL import Image
+
+from pypicolcd import (
+    DC_DICT,
+    OUT_REPORT_LED_STATE,
+    OUT_REPORT_LCD_BACKLIGHT,
+    OUT_REPORT_LCD_CONTRAST,
+    OUT_REPORT_LCD_CONTROL,
+    OUT_REPORT_LCD_CLEAR,
+    OUT_REPORT_DATA,
+    OUT_REPORT_CMD_DATA,
+)
+
+PRODUCT_ID = 0xc002  # picoLCD 256x64 (see DC_DICT)
+CHIP_COLUMNS = 64  # the column address of each chip wraps to 0 after 63
+
+
+class SimulatedDevice:
+    """
+    A simulated picoLCD 256x64 that can be used in place of a device
+    from usb.busses() (it also acts as the handle that its open method
+    returns).
+
+    Faults:
+    - Call unplug to make transfers and open fail (as if the device
+      were disconnected) until plug is called. Plugging it in again
+      clears the panel, as resetting the real device does.
+    - Call fail_next to make the next transfers fail once each.
+    - Set fail_rate to make each transfer fail with that probability.
+    A failed transfer raises usb.core.USBError like pyusb does, and
+    the panel does not change.
+    """
+    idVendor = 0x04d8
+    idProduct = PRODUCT_ID
+
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=None):
+        """
+        Keyword arguments:
+        latency -- seconds that each transfer takes (a transfer fails
+            if this is longer than its timeout)
+        fail_rate -- the probability (0.0-1.0) that any transfer fails
+        seed -- seed the random failures (see fail_rate) for
+            repeatable tests
+        """
+        self.dc = DC_DICT[str(PRODUCT_ID)]
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._fail_count = 0
+        self._lock = threading.Lock()
+        self.plugged = True
+        self.opened = False
+        self.width = self.dc["width"]
+        self.height = self.dc["height"]
+        self.memory = None  # the panel (see PicoLCD.framebuffer)
+        self.columns = None  # the column address of each chip
+        self.pages = None  # the page address of each chip
+        self.backlight = 0
+        self.contrast = 0
+        self.leds = 0
+        self.reset()
+        self.transfers = 0  # successful transfers
+        self.bytes_received = 0  # during successful transfers
+        self.failures = 0  # failed transfers
+        self.reports = {}  # report ID: count of successful transfers
+
+    def reset(self):
+        """
+        Clear the panel and the addresses of the chips (as powering on
+        the device does).
+        """
+        with self._lock:
+            chip_count = self.width // CHIP_COLUMNS
+            self.memory = bytearray(self.width
+                                    * (self.height // self.dc["ppb"]))
+            self.columns = [0] * chip_count
+            self.pages = [0] * chip_count
+
+    def unplug(self):
+        self.plugged = False
+        self.opened = False
+
+    def plug(self):
+        if not self.plugged:
+            self.reset()
+            self.plugged = True
+
+    def fail_next(self, count=1):
+        """
+        Make the next count transfers fail.
+        """
+        with self._lock:
+            self._fail_count += count
+
+    # The following methods are those of a pyusb (legacy API) device
+    # and its handle that PicoLCD uses.
+
+    def open(self):
+        if not self.plugged:
+            raise usb.core.USBError("No such device (simulated)")
+        self.opened = True
+        return self
+
+    def detachKernelDriver(self, interface):
+        pass
+
+    def claimInterface(self, interface):
+        if not self.plugged:
+            raise usb.core.USBError("No such device (simulated)")
+
+    def setAltInterface(self, alternate):
+        pass
+
+    def interruptWrite(self, endpoint, data, timeout=100):
+        """
+        Receive a report.
+
+        Returns:
+            the number of bytes written
+        """
+        if self.latency > 0:
+            time.sleep(min(self.latency, timeout / 1000.0))
+        with self._lock:
+            if (not self.plugged) or (not self.opened):
+                self.failures += 1
+                raise usb.core.USBError("No such device (simulated)")
+            if self.latency * 1000.0 > timeout:
+                self.failures += 1
+                raise usb.core.USBError("Operation timed out (simulated)")
+            if self._fail_count > 0:
+                self._fail_count -= 1
+                self.failures += 1
+                raise usb.core.USBError("Input/Output Error (simulated)")
+            if (self.fail_rate > 0) and \
+                    (self._random.random() < self.fail_rate):
+                self.failures += 1
+                raise usb.core.USBError("Input/Output Error (simulated)")
+            m = bytearray(data)
+            self._decode(m)
+            self.transfers += 1
+            self.bytes_received += len(m)
+            self.reports[m[0]] = self.reports.get(m[0], 0) + 1
+            return len(m)
+
+    def _decode(self, m):
+        report = m[0]
+        if report == OUT_REPORT_CMD_DATA:
+            # [1] chip select, [2] command count, then 3 bytes per
+            # command where the last is the command, then the data
+            # length and the data.
+            chip = m[1] >> 2
+            count = m[2]
+            for i in range(count):
+                self._command(chip, m[5 + 3 * i])
+            start = 6 + 3 * count
+            self._put(chip, m[start:start + m[start - 1]])
+        elif report == OUT_REPORT_DATA:
+            # [1] chip select, [4] data length, then the data.
+            self._put(m[1] >> 2, m[5:5 + m[4]])
+        elif report == OUT_REPORT_LCD_BACKLIGHT:
+            self.backlight = m[1]
+        elif report == OUT_REPORT_LCD_CONTRAST:
+            self.contrast = m[1]
+        elif report == OUT_REPORT_LED_STATE:
+            self.leds = m[1]
+        elif report == OUT_REPORT_LCD_CLEAR:
+            self.memory[:] = bytearray(len(self.memory))
+        elif report == OUT_REPORT_LCD_CONTROL:
+            pass
+        # Other reports are counted (see reports) but ignored.
+
+    def _command(self, chip, command):
+        if command & 0xf8 == 0xb8:
+            self.pages[chip] = command & 0x07
+        elif command & 0xc0 == 0x40:
+            self.columns[chip] = command & 0x3f
+
+    def _put(self, chip, data):
+        base = self.pages[chip] * self.width + chip * CHIP_COLUMNS
+        column = self.columns[chip]
+        for b in data:
+            self.memory[base + column] = b
+            column = (column + 1) % CHIP_COLUMNS
+        self.columns[chip] = column
+
+    def get_pixel(self, pos):
+        """
+        Check whether a pixel on the panel is on (dark).
+        """
+        x, y = pos
+        ppb = self.dc["ppb"]
+        return bool(self.memory[(y // ppb) * self.width + x]
+                    & (1 << (y % ppb)))
+
+    def get_image(self):
+        """
+        Get the panel as a mode "1" PIL image where pixels that are on
+        are black.
+        """
+        ppb = self.dc["ppb"]
+        rows = bytearray()
+        row_size = (self.width + 7) // 8
+        for y in range(self.height):
+            row = bytearray(row_size)
+            page = (y // ppb) * self.width
+            bit = 1 << (y % ppb)
+            for x in range(self.width):
+                if not (self.memory[page + x] & bit):
+                    row[x >> 3] |= 0x80 >> (x & 7)
+            rows += row
+        return Image.frombytes("1", (self.width, self.height),
+                               bytes(rows))
+
+
+class NullDevice(SimulatedDevice):
+    """
+    A SimulatedDevice that counts reports (see SimulatedDevice) but
+    does not decode them, so it takes almost no time (for measuring the
+    time spent in pypicolcd itself).
+    """
+
+    def _decode(self, m):
+        pass
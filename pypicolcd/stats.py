@@ -7,9 +7,9 @@ import copy
 from datetime import datetime
 
 from pypicolcd import lcdclient
-from pypicolcd.lcdframebuffer import get_commands
-from pypicolcd.lcdframebuffer import get_bool_options
-from pypicolcd import to_bool
+from pypicolcd.lcdprotocol import get_commands
+from pypicolcd.lcdprotocol import get_bool_options
+from pypicolcd.lcdprotocol import to_bool
 
 _MAX_LINES = 4
 
@@ -381,7 +381,6 @@ def run_and_add_stats(args):
         print("There are no custom lines.")
     first = True
     for key in batch_order:
-        print("")
         action = batch[key]
         if not first:
             try:
@@ -393,7 +392,14 @@ def run_and_add_stats(args):
             except KeyError:
                 pass
         first = False
-        results = lcdclient.send_action(action)
+    # Draw them all then write the LCD once (see send_batch).
+    print("")
+    all_results = lcdclient.send_batch(
+        [batch[key] for key in batch_order]
+    )
+    for key, results in zip(batch_order, all_results):
+        print("")
+        action = batch[key]
         if results.get("status") != "OK":
             print('* {}'.format(results))
             print("  * in response to showing {}:"
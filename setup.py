@@ -35,10 +35,15 @@ setuptools.setup(
     entry_points={
         'console_scripts': ['lcd-cli=pypicolcd.command_line:main',
                             'lcd-fb=pypicolcd.lcdframebuffer:main',
-                            'lcd-stats=pypicolcd.stats:main'],
+                            'lcd-stats=pypicolcd.stats:main',
+                            'lcd-glyph-cache=pypicolcd.glyphcache:main',
+                            'lcd-benchmark=pypicolcd.benchmark:main'],
     },
     install_requires=[
         'pyusb',
         'Pillow',
-    ]
+    ],
+    extras_require={
+        'numpy': ['numpy>=1.17'],  # for packbits bitorder
+    },
  )